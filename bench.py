@@ -0,0 +1,310 @@
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import fontTools
+
+import font as font_module
+import main as main_module
+from font import (
+    WEB_FONT_FLAVORS, Font, FontGlyph, FontGlyphKind, build_baselines_font, build_baselines_font_bytes,
+    build_baselines_ttfont, load_label_font, draw_text_centered, measure_text, web_font_path,
+)
+from geometry import GlyphGeometry
+
+BENCH_VERSION = 1
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    runs: int
+    min_ms: float
+    median_ms: float
+    mean_ms: float
+    peak_memory_bytes: int
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[], None]
+    # Called before every run, outside of the timed section
+    setup: Optional[Callable[[], None]] = None
+
+
+def run_benchmark(benchmark: Benchmark, runs: int, warmup: int) -> BenchmarkResult:
+    for _ in range(warmup):
+        if benchmark.setup:
+            benchmark.setup()
+        benchmark.func()
+
+    timings = []
+    for _ in range(runs):
+        if benchmark.setup:
+            benchmark.setup()
+        start = time.perf_counter()
+        benchmark.func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Memory is measured in a separate run, as tracing slows everything down
+    if benchmark.setup:
+        benchmark.setup()
+    tracemalloc.start()
+    benchmark.func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return BenchmarkResult(
+        name=benchmark.name,
+        runs=runs,
+        min_ms=min(timings),
+        median_ms=statistics.median(timings),
+        mean_ms=statistics.fmean(timings),
+        peak_memory_bytes=peak,
+    )
+
+
+def clear_drawing_caches():
+    font_module._text_outline_cache.clear()
+    font_module._geometry_cache.clear()
+
+
+def font_benchmarks(fonts: List[Font]) -> List[Benchmark]:
+    label_font = load_label_font()
+    font = fonts[0]
+    label = "IDEOGRAPHIC-UNDER"
+
+    def only_kind(kind: FontGlyphKind) -> Font:
+        return dataclasses.replace(font, glyphs=[glyph for glyph in font.glyphs if glyph.kind == kind])
+
+    benchmarks = [
+        Benchmark("measure_text", lambda: measure_text(label_font, label)),
+        Benchmark(
+            "draw_text_centered",
+            lambda: draw_text_centered(GlyphGeometry(), label_font, label, 500, 0),
+            setup=clear_drawing_caches,
+        ),
+        Benchmark(
+            "draw_text_centered.cached",
+            lambda: draw_text_centered(GlyphGeometry(), label_font, label, 500, 0),
+        ),
+        # A font without glyphs still has .notdef and X, and all of its tables
+        Benchmark(
+            "build.tables",
+            lambda: build_baselines_ttfont(dataclasses.replace(font, glyphs=[])),
+            setup=clear_drawing_caches,
+        ),
+    ]
+    for kind in FontGlyphKind:
+        kind_font = only_kind(kind)
+        benchmarks.append(Benchmark(
+            f"build.glyphs.{kind.name.lower()}",
+            lambda kind_font=kind_font: build_baselines_ttfont(kind_font),
+            setup=clear_drawing_caches,
+        ))
+    # Whole Unicode blocks mapped to one glyph should cost about as much as one code point
+    for size_name, ranges in [("small", [(0x4E00, 0x4E09)]), ("large", [(0x4E00, 0x9FFF), (0x20000, 0x2A6DF)])]:
+        range_font = dataclasses.replace(font, glyphs=[FontGlyph("█", FontGlyphKind.EMBOX_FILLED, ranges=ranges)])
+        benchmarks.append(Benchmark(
+            f"build.ranges.{size_name}",
+            lambda range_font=range_font: build_baselines_font_bytes(range_font),
+            setup=clear_drawing_caches,
+        ))
+    for each in fonts:
+        benchmarks.append(Benchmark(
+            f"build.{each.name}",
+            lambda each=each: build_baselines_ttfont(each),
+            setup=clear_drawing_caches,
+        ))
+    # Fonts built in one process share the glyphs they have in common
+    benchmarks.append(Benchmark(
+        "build.all",
+        lambda: [build_baselines_ttfont(each) for each in fonts],
+        setup=clear_drawing_caches,
+    ))
+
+    # Simplified builds, against the build.* benchmarks of the same font above
+    for use_components in (True, False):
+        benchmarks.append(Benchmark(
+            f"simplify.{'components' if use_components else 'flat'}",
+            lambda use_components=use_components: build_baselines_ttfont(
+                font, use_components=use_components, simplified=[],
+            ),
+            setup=clear_drawing_caches,
+        ))
+
+    ttfont = build_baselines_ttfont(font)
+    benchmarks.append(Benchmark("save.ttf", lambda: ttfont.save(io.BytesIO())))
+    for flavor in WEB_FONT_FLAVORS:
+        def save_flavor(flavor=flavor):
+            ttfont.flavor = flavor
+            ttfont.save(io.BytesIO())
+            ttfont.flavor = None
+        benchmarks.append(Benchmark(f"save.{flavor}", save_flavor))
+    return benchmarks
+
+
+def output_benchmarks(fonts: List[Font]) -> List[Benchmark]:
+    # The writers print their output paths, which would drown the results
+    def quiet(func: Callable[[], None]) -> Callable[[], None]:
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+        return run
+
+    context = main_module.BuildContext(fonts)
+    return [
+        Benchmark("prepare_template_data", lambda: main_module.prepare_template_data(fonts)),
+        Benchmark("write_font_stylesheet", quiet(lambda: main_module.write_font_stylesheet(fonts))),
+        Benchmark("write_font_html", quiet(lambda: main_module.write_font_html(context))),
+        Benchmark("write_font_readme", quiet(lambda: main_module.write_font_readme(context))),
+        Benchmark("write_font_license", quiet(lambda: main_module.write_font_license(context))),
+        Benchmark("render_font_page", lambda: main_module.render_font_page("README.md.jinja", fonts[0])),
+    ]
+
+
+def output_sizes(fonts: List[Font]) -> Dict[str, int]:
+    sizes = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for font in fonts:
+            out_path = f"dist/{font.name}.ttf"
+            build_baselines_font(font, out_path)
+            for path in [out_path, *(web_font_path(out_path, flavor) for flavor in WEB_FONT_FLAVORS)]:
+                sizes[os.path.basename(path)] = os.path.getsize(path)
+            # The size the font would have without composite glyphs, which builds
+            # do not pay for
+            flat_data = io.BytesIO()
+            build_baselines_ttfont(font, use_components=False).save(flat_data)
+            sizes[f"{font.name}.flat.ttf"] = len(flat_data.getvalue())
+        context = main_module.BuildContext(fonts)
+        main_module.write_font_stylesheet(fonts)
+        main_module.write_font_html(context)
+        main_module.write_font_readme(context)
+    for name in sorted(os.listdir("dist")):
+        if name not in sizes:
+            sizes[name] = os.path.getsize(os.path.join("dist", name))
+    return sizes
+
+
+def size_report(sizes: Dict[str, int]) -> List[str]:
+    """Describes the size of each font next to the size it would have without composite glyphs."""
+    lines = []
+    for name, flat_size in sorted(sizes.items()):
+        if not name.endswith(".flat.ttf"):
+            continue
+        font_name = name[:-len(".flat.ttf")]
+        size = sizes[f"{font_name}.ttf"]
+        lines.append(
+            f"{font_name}.ttf: {size:,} bytes, {flat_size:,} bytes without composite glyphs "
+            f"({1 - size / flat_size:.0%} smaller)"
+        )
+    return lines
+
+
+def run_suite(runs: int, warmup: int, name_filter: Optional[str] = None) -> dict:
+    fonts = main_module.default_fonts()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as out_dir:
+        # Outputs are written relative to the working directory, so run everything
+        # from a scratch directory rather than overwriting dist/
+        os.chdir(out_dir)
+        try:
+            os.makedirs("dist")
+            benchmarks = font_benchmarks(fonts) + output_benchmarks(fonts)
+            if name_filter:
+                benchmarks = [benchmark for benchmark in benchmarks if name_filter in benchmark.name]
+            results = []
+            for benchmark in benchmarks:
+                result = run_benchmark(benchmark, runs, warmup)
+                results.append(result)
+                print(
+                    f"{result.name:<40} {result.median_ms:>9.3f} ms  (min {result.min_ms:.3f} ms, "
+                    f"peak {result.peak_memory_bytes / 1024:,.0f} KiB)",
+                    file=sys.stderr,
+                )
+            sizes = output_sizes(fonts)
+            for line in size_report(sizes):
+                print(line, file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "version": BENCH_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "fonttools": fontTools.version,
+            "platform": platform.platform(),
+        },
+        "benchmarks": {result.name: dataclasses.asdict(result) for result in results},
+        "sizes": sizes,
+    }
+
+
+def compare(report: dict, baseline: dict, time_threshold: float, size_threshold: float) -> List[str]:
+    """
+    Returns a description of every benchmark whose median time grew by more than
+    `time_threshold`, and every output whose size grew by more than `size_threshold`
+    (both as fractions of the baseline value).
+    """
+    regressions = []
+    for name, result in report["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base and result["median_ms"] > base["median_ms"] * (1 + time_threshold):
+            regressions.append(
+                f"{name}: {base['median_ms']:.3f} ms -> {result['median_ms']:.3f} ms "
+                f"(+{result['median_ms'] / base['median_ms'] - 1:.0%})"
+            )
+    for name, size in report["sizes"].items():
+        base_size = baseline.get("sizes", {}).get(name)
+        if base_size and size > base_size * (1 + size_threshold):
+            regressions.append(f"{name}: {base_size:,} bytes -> {size:,} bytes (+{size / base_size - 1:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the font builder and output generators.")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per benchmark (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs per benchmark (default: %(default)s)")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--time-threshold", type=float, default=0.25,
+                        help="allowed fractional increase of median times (default: %(default)s)")
+    parser.add_argument("--size-threshold", type=float, default=0.0,
+                        help="allowed fractional increase of output sizes (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.runs, args.warmup, args.filter)
+
+    report_json = json.dumps(report, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report_json)
+    else:
+        sys.stdout.write(report_json)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.time_threshold, args.size_threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,41 @@
+import bisect
+import hashlib
+import io
+import itertools
 import os
-from dataclasses import dataclass, field
-from enum import auto, Enum
-from typing import List, Literal, Optional, Union
+import re
+import string
+import struct
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 from fontTools.fontBuilder import FontBuilder
+from fontTools.misc.roundTools import noRound
 from fontTools.pens.transformPen import TransformPen
 from fontTools.pens.ttGlyphPen import TTGlyphPen
 from fontTools.ttLib import TTFont, getTableClass, newTable
 from fontTools.ttLib.tables import otTables
 
-BORDER_WIDTH = 12
-
-
-@dataclass
-class FontBaselineStyle:
-    stroke_style: str
-    stroke_width: int
-
-
-FontBaselineStyle.SOLID = FontBaselineStyle("solid", 12)
-FontBaselineStyle.DASHED = FontBaselineStyle("dashed", 8)
-
-
-@dataclass
-class FontBaseline:
-    id: str
-    position: int
-    table: Union[Literal["BASE", "OS/2", "hhea"], None]
-    name: str
-    label: str
-    style: FontBaselineStyle
-
-
-class FontGlyphKind(Enum):
-    EMBOX_FILLED = auto()
-    EMBOX_OUTLINE = auto()
-    PAIR_LAYOUT = auto()
-    PAIR_LABELED = auto()
+import tracing
+from geometry import GlyphGeometry, Point, Rectangle, union_rectangles
+from model import (
+    BASELINE_AXIS_NAME, BASELINE_AXIS_TAG, FONT_CHUNKS, WEB_FONT_FLAVORS, Font, FontBaseline, FontBaselineStyle,
+    FontChunk, FontGlyph, FontGlyphKind, FontMaster, chunk_codepoints, chunk_font_path, chunk_font_paths,
+    em_size_of, glyph_name_for_char, web_font_path,
+)
 
+BORDER_WIDTH = 12
 
-@dataclass
-class FontGlyph:
-    char: str
-    kind: FontGlyphKind
-    baseline_ids: Optional[List[str]] = None
-
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+LABEL_FONT_PATH = os.path.join(ROOT_DIR, "support", "noto", "NotoSansMono-Bold.ttf")
+LABEL_FONT_CACHE_DIR = os.path.join(ROOT_DIR, ".cache", "label-font")
 
-@dataclass
-class Font:
-    name: str
-    description: str
-    baselines: List[FontBaseline]
-    glyphs: List[FontGlyph] = field(default_factory=list)
+# Characters always kept in the label font subset, so that fonts with the usual
+# upper-case labels share one subset (and one cached outline set).
+LABEL_CHARACTERS = string.ascii_uppercase + string.digits + " -_."
 
 
 @dataclass
@@ -87,10 +71,12 @@ def measure_text(font, text: str, letter_gap=0.0) -> TextMetrics:
     font_horizontal_metrics = font["hmtx"]
     em_units = font_head.unitsPerEm
 
+    char_map = font.getBestCmap()
+    glyph_set = font.getGlyphSet()
+
     glyphs: List[GlyphMetrics] = []
     for char in text:
-        glyph_name = font.getBestCmap()[ord(char)]
-        glyph_set = font.getGlyphSet()
+        glyph_name = char_map[ord(char)]
         glyph = glyph_set[glyph_name]
         glyphs.append(
             GlyphMetrics(glyph, font_horizontal_metrics[glyph_name][0] / em_units)
@@ -99,16 +85,86 @@ def measure_text(font, text: str, letter_gap=0.0) -> TextMetrics:
     return TextMetrics(scale=1.0 / em_units, letter_gap=letter_gap, glyphs=glyphs)
 
 
-def draw_text_centered(
-    pen, font, text, x, y, font_size=50, scale_y=1.0, letter_gap=0.0, offset_y=-0.1
-) -> Rect:
+_label_fonts: Dict[Tuple[str, frozenset], TTFont] = {}
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_label_font(chars="", path=LABEL_FONT_PATH, cache_dir=LABEL_FONT_CACHE_DIR) -> TTFont:
+    """
+    Returns the label font subset to `LABEL_CHARACTERS` plus the given characters.
+
+    The subset is loaded once per process, and is stored on disk keyed by the hash
+    of the source font, so that later processes skip parsing the full source font.
+    """
+    charset = frozenset(LABEL_CHARACTERS) | frozenset(chars)
+    key = (path, charset)
+    if key in _label_fonts:
+        return _label_fonts[key]
+
+    charset_hash = hashlib.sha256("".join(sorted(charset)).encode("utf-8")).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{_file_hash(path)[:16]}-{charset_hash[:16]}.ttf")
+
+    if not os.path.exists(cache_path):
+        from fontTools import subset
+
+        options = subset.Options()
+        options.layout_features = []
+        options.hinting = False
+        options.notdef_outline = True
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=[ord(char) for char in charset])
+        source_font = TTFont(path)
+        subsetter.subset(source_font)
+
+        # Write to a temporary file first so that concurrent builds never read a
+        # partially written cache entry.
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        source_font.save(tmp_path)
+        os.replace(tmp_path, cache_path)
+
+    label_font = TTFont(cache_path)
+    _label_fonts[key] = label_font
+    return label_font
+
+
+@dataclass
+class TextOutline:
+    """Label outline (as flat glyph arrays) relative to the center point of the text."""
+    coordinates: List[float]
+    flags: bytes
+    end_points: List[int]
+    rect: Rect
+
+
+TextOutlineKey = Tuple[str, float, float, float, float]
+
+# Outlines are cached per label font, and dropped along with the font itself.
+_text_outline_cache: "weakref.WeakKeyDictionary[TTFont, Dict[TextOutlineKey, TextOutline]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_text_outline(
+    font, text, font_size=50, scale_y=1.0, letter_gap=0.0, offset_y=-0.1
+) -> TextOutline:
+    font_cache = _text_outline_cache.setdefault(font, {})
+    key = (text, font_size, scale_y, letter_gap, offset_y)
+    if key in font_cache:
+        return font_cache[key]
+
     text_metrics = measure_text(font, text, letter_gap)
     height = font_size * scale_y
     width = text_metrics.width() * font_size
 
-    x_pos = x - width / 2
-    y_pos = y - height / 2
+    x_pos = -width / 2
+    y_pos = -height / 2
 
+    pen = TTGlyphPen(None)
     for glyph in text_metrics.glyphs:
         transform_pen = TransformPen(
             pen,
@@ -124,65 +180,124 @@ def draw_text_centered(
         glyph.glyph.draw(transform_pen)
         x_pos += font_size * (glyph.width + letter_gap)
 
-    return Rect(x=(x - width / 2), y=(y - height / 2), width=width, height=height)
+    # Coordinates stay unrounded until the outline is placed in a glyph
+    glyph = pen.glyph(round=noRound)
+    outline = TextOutline(
+        coordinates=glyph.coordinates.array,
+        flags=bytes(glyph.flags),
+        end_points=glyph.endPtsOfContours,
+        rect=Rect(x=(-width / 2), y=(-height / 2), width=width, height=height),
+    )
+    font_cache[key] = outline
+    return outline
+
+
+# Drawn glyphs and parts of glyphs, shared by every font built in this process.
+# Keys hold everything that a drawing depends on, so fonts reuse each other's
+# outlines wherever they agree. Like text outlines, they are kept per label font.
+GEOMETRY_CACHE_SIZE = 4096
+_geometry_cache: "weakref.WeakKeyDictionary[TTFont, OrderedDict[tuple, GlyphGeometry]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def cached_geometry(label_font: TTFont, key: tuple, draw: Callable[[GlyphGeometry], None]) -> GlyphGeometry:
+    """
+    Returns the geometry drawn by `draw` for `key`, drawing it only the first time.
+    The returned geometry is shared, so it is frozen, and can only be added to
+    other geometries. Geometries are cached per process, so fonts only share them
+    when they are built in the same process, as with `--jobs 1` or `--watch`.
+    """
+    font_cache = _geometry_cache.setdefault(label_font, OrderedDict())
+    geometry = font_cache.get(key)
+    if geometry is not None:
+        font_cache.move_to_end(key)
+        return geometry
+
+    geometry = GlyphGeometry()
+    draw(geometry)
+    geometry.freeze()
+    font_cache[key] = geometry
+    if len(font_cache) > GEOMETRY_CACHE_SIZE:
+        font_cache.popitem(last=False)
+    return geometry
+
+
+def draw_text_centered(
+    geometry: GlyphGeometry, font, text, x, y, font_size=50, scale_y=1.0, letter_gap=0.0, offset_y=-0.1
+) -> Rect:
+    outline = get_text_outline(font, text, font_size, scale_y, letter_gap, offset_y)
+    geometry.add_contours(outline.coordinates, outline.flags, outline.end_points, x, y)
+
+    rect = outline.rect
+    return Rect(x=(x + rect.x), y=(y + rect.y), width=rect.width, height=rect.height)
 
 
-def draw_rectangle(pen, x1, y1, x2, y2):
-    pen.moveTo((x1, y1))
-    pen.lineTo((x2, y1))
-    pen.lineTo((x2, y2))
-    pen.lineTo((x1, y2))
-    pen.closePath()
+def draw_rectangle(geometry: GlyphGeometry, x1, y1, x2, y2):
+    geometry.add_rectangles([(x1, y1, x2, y2)])
 
 
-def draw_bordered_rectangle(pen, x1, y1, x2, y2, stroke_width=12):
+def draw_bordered_rectangle(geometry: GlyphGeometry, x1, y1, x2, y2, stroke_width=12):
     # Draw a rectangle for each edge
-    draw_rectangle(pen, x1, y1, x2, y1 + stroke_width)
-    draw_rectangle(pen, x1, y2 - stroke_width, x2, y2)
-    draw_rectangle(pen, x1, y1 + stroke_width, x1 + stroke_width, y2 - stroke_width)
-    draw_rectangle(pen, x2 - stroke_width, y1 + stroke_width, x2, y2 - stroke_width)
+    geometry.add_rectangles([
+        (x1, y1, x2, y1 + stroke_width),
+        (x1, y2 - stroke_width, x2, y2),
+        (x1, y1 + stroke_width, x1 + stroke_width, y2 - stroke_width),
+        (x2 - stroke_width, y1 + stroke_width, x2, y2 - stroke_width),
+    ])
 
 
-def draw_dashed_line(pen, y, start, end, stroke_width=4, dash_width=12, gap=6):
-    for x in range(round(start), round(end), dash_width + gap):
-        draw_solid_line(pen, y, x, x + dash_width, stroke_width)
+def draw_dashed_line(geometry: GlyphGeometry, y, start, end, stroke_width=4, dash_width=12, gap=6):
+    y1 = y - stroke_width / 2
+    y2 = y + stroke_width / 2
+    geometry.add_rectangles(
+        (x, y1, x + dash_width, y2) for x in range(round(start), round(end), dash_width + gap)
+    )
 
 
-def draw_solid_line(pen, y, start, end, stroke_width=4):
-    draw_rectangle(pen, start, y - stroke_width / 2, end, y + stroke_width / 2)
+def draw_solid_line(geometry: GlyphGeometry, y, start, end, stroke_width=4):
+    draw_rectangle(geometry, start, y - stroke_width / 2, end, y + stroke_width / 2)
 
 
-def draw_line(pen, y, start, end, style="solid", stroke_width=8):
+def draw_line(geometry: GlyphGeometry, y, start, end, style="solid", stroke_width=8):
     if style == "solid":
-        draw_solid_line(pen, y, start, end, stroke_width=stroke_width)
+        draw_solid_line(geometry, y, start, end, stroke_width=stroke_width)
     elif style == "dashed":
-        draw_dashed_line(pen, y, start, end, stroke_width=stroke_width)
+        draw_dashed_line(geometry, y, start, end, stroke_width=stroke_width)
 
 
-def draw_baseline(pen, font, y, em_size, label, style="solid", stroke_width=8):
+def draw_baseline(geometry: GlyphGeometry, font, y, em_size, label, style="solid", stroke_width=8):
     if label:
-        drawn_text = draw_text_centered(
-            pen, font, label, em_size / 2, y, font_size=50, scale_y=1, letter_gap=0
+        draw_text_centered(
+            geometry, font, label, em_size / 2, y, font_size=50, scale_y=1, letter_gap=0
         )
+    draw_baseline_line(geometry, font, y, em_size, label, style=style, stroke_width=stroke_width)
+
+
+def draw_baseline_line(geometry: GlyphGeometry, font, y, em_size, label, style="solid", stroke_width=8):
+    """Draws the line of a baseline, leaving a gap for the label if there is one."""
+    if label:
+        text_rect = get_text_outline(font, label, font_size=50, scale_y=1, letter_gap=0).rect
+        text_x = em_size / 2 + text_rect.x
         draw_line(
-            pen,
+            geometry,
             style=style,
             stroke_width=stroke_width,
             y=y,
             start=BORDER_WIDTH,
-            end=drawn_text.x - BORDER_WIDTH,
+            end=text_x - BORDER_WIDTH,
         )
         draw_line(
-            pen,
+            geometry,
             style=style,
             stroke_width=stroke_width,
             y=y,
-            start=drawn_text.x + drawn_text.width + BORDER_WIDTH,
+            start=text_x + text_rect.width + BORDER_WIDTH,
             end=em_size - BORDER_WIDTH,
         )
     else:
         draw_line(
-            pen,
+            geometry,
             style=style,
             stroke_width=stroke_width,
             y=y,
@@ -191,7 +306,283 @@ def draw_baseline(pen, font, y, em_size, label, style="solid", stroke_width=8):
         )
 
 
-def build_baselines_font(font: Font, out_path: str):
+class GlyphParts:
+    """
+    Parts shared between glyphs (the em-box border, baselines and labels). These are
+    either drawn directly into each glyph, or drawn once into a base glyph that the
+    glyphs then reference as a component.
+
+    With a `simplified` list, the parts drawn into a glyph are collected until the
+    glyph is finished (see `finish`), and their overlapping rectangles are merged.
+    Every glyph and base glyph that this simplifies is appended to the list.
+    """
+
+    def __init__(self, use_components=True, simplified: Optional[List["GlyphSimplification"]] = None):
+        self.use_components = use_components
+        self.simplified = simplified
+        self.names: Dict[tuple, str] = {}
+        self.geometries: Dict[str, GlyphGeometry] = {}
+        self.pending: Dict[int, List[Tuple[tuple, str, GlyphGeometry]]] = {}
+        self.merged: Dict[tuple, Tuple[Optional[GlyphGeometry], int, int]] = {}
+
+    def draw(self, geometry: GlyphGeometry, key: tuple, name: str, part: GlyphGeometry):
+        if self.simplified is not None:
+            self.pending.setdefault(id(geometry), []).append((key, name, part))
+            return
+        self._add(geometry, key, name, part)
+
+    def _add(self, geometry: GlyphGeometry, key: tuple, name: str, part: GlyphGeometry):
+        if not self.use_components:
+            geometry.add_geometry(part)
+            return
+
+        if key not in self.names:
+            name = re.sub(r"[^A-Za-z0-9_.]", "_", name)
+            unique_name = name
+            while unique_name in self.geometries:
+                unique_name = f"{name}.{len(self.geometries)}"
+            self.names[key] = unique_name
+            self.geometries[unique_name] = part
+        geometry.add_component(self.names[key])
+
+    def finish(self, geometry: GlyphGeometry, glyph_name: str) -> GlyphGeometry:
+        """
+        Returns the geometry of a glyph once all of its parts are drawn. Without
+        components, the whole glyph is simplified. With components, parts whose
+        rectangles overlap each other, like a dashed line running into the border,
+        are merged into one base glyph, and every other part is simplified on its own.
+        """
+        if self.simplified is None:
+            return geometry
+        pending = self.pending.pop(id(geometry), [])
+        if not self.use_components:
+            for _, _, part in pending:
+                geometry.add_geometry(part)
+            simplified = simplify_geometry(geometry)
+            if simplified is None:
+                return geometry
+            self.simplified.append(GlyphSimplification(
+                glyph_name, len(geometry.flags), len(simplified.flags),
+                len(geometry.end_points), len(simplified.end_points),
+            ))
+            return simplified
+
+        # Contours such as labels, under which overlapping rectangles of other parts
+        # must not be merged
+        protected = [
+            _contour_bounds(coordinates)
+            for _, _, part in pending for coordinates, flags in _contours(part)
+            if not _contour_rectangle(coordinates, flags)
+        ]
+        for group in _overlapping_groups([part for _, _, part in pending]):
+            members = [pending[i] for i in group]
+            combined = GlyphGeometry()
+            for _, _, part in members:
+                combined.add_geometry(part)
+            # Only protected areas over rectangles that overlap each other matter, so
+            # that glyphs with different labels still share the merged part
+            rectangles = [rect for rect in (_contour_rectangle(*contour) for contour in _contours(combined)) if rect]
+            overlaps = [
+                _intersection(a, b) for i, a in enumerate(rectangles) for b in rectangles[i + 1:] if _overlaps(a, b)
+            ]
+            relevant = tuple(sorted(set(
+                each for each in protected if any(_overlaps(each, overlap) for overlap in overlaps)
+            )))
+            if not relevant:
+                # A part drawn twice, like a baseline drawn both with and without its
+                # label, only covers its area again, which matters nowhere else
+                members = list({key: (key, name, part) for key, name, part in members}.values())
+                combined = GlyphGeometry()
+                for _, _, part in members:
+                    combined.add_geometry(part)
+            merge_key = (tuple(key for key, _, _ in members), relevant)
+            if merge_key not in self.merged:
+                simplified = simplify_geometry(combined, relevant)
+                self.merged[merge_key] = (
+                    simplified.freeze() if simplified else None, len(combined.flags), len(combined.end_points),
+                )
+            simplified, points_before, contours_before = self.merged[merge_key]
+            if simplified is None:
+                for member in members:
+                    self._add(geometry, *member)
+                continue
+
+            key = ("simplified", merge_key)
+            is_new = key not in self.names
+            self._add(geometry, key, "_".join(name for _, name, _ in members)[:60], simplified)
+            if is_new:
+                self.simplified.append(GlyphSimplification(
+                    self.names[key], points_before, len(simplified.flags),
+                    contours_before, len(simplified.end_points),
+                ))
+        return geometry
+
+
+def cmap_groups(char_map: Dict[int, str], range_map: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+    """
+    Returns the single code points and ranges as sorted (first, last, glyph name)
+    groups, joining adjacent groups of the same glyph.
+    """
+    groups: List[Tuple[int, int, str]] = []
+    for first, last, name in sorted([*((cp, cp, name) for cp, name in char_map.items()), *range_map]):
+        if first > last:
+            raise ValueError(f"Range U+{first:04X}-U+{last:04X} of {name} is inverted")
+        if groups and first <= groups[-1][1] and name != groups[-1][2]:
+            raise ValueError(f"U+{first:04X} is mapped to both {groups[-1][2]} and {name}")
+        if groups and first <= groups[-1][1] + 1 and name == groups[-1][2]:
+            groups[-1] = (groups[-1][0], max(last, groups[-1][1]), name)
+        else:
+            groups.append((first, last, name))
+    return groups
+
+
+class CodePointMap(Mapping):
+    """Maps code points to glyph names through sorted (first, last, glyph name) groups, without expanding them."""
+
+    def __init__(self, groups: List[Tuple[int, int, str]]):
+        self.groups = groups
+        self._firsts = [first for first, _, _ in groups]
+
+    def __getitem__(self, cp: int) -> str:
+        index = bisect.bisect_right(self._firsts, cp) - 1
+        if index >= 0 and cp <= self.groups[index][1]:
+            return self.groups[index][2]
+        raise KeyError(cp)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(range(first, last + 1) for first, last, _ in self.groups)
+
+    def __len__(self) -> int:
+        return sum(last - first + 1 for first, last, _ in self.groups)
+
+
+def setup_range_cmap(ttfont: TTFont, char_map: Dict[int, str], range_map: List[Tuple[int, int, str]]):
+    """
+    Adds a format 13 subtable (Unicode platform, full repertoire encoding) that maps
+    every range to its glyph with one group, so its size does not depend on the
+    number of code points covered. Single code points stay in the format 4
+    subtables for renderers that ignore format 13; format 12 subtables are dropped,
+    as renderers prefer them over format 13.
+    """
+    from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+
+    cmap_table = ttfont["cmap"]
+    cmap_table.tables = [table for table in cmap_table.tables if table.format != 12]
+
+    glyph_ids = ttfont.getReverseGlyphMap()
+    groups = cmap_groups(char_map, range_map)
+    subtable = CmapSubtable.newSubtable(13)
+    subtable.platformID = 0
+    subtable.platEncID = 6
+    subtable.language = 0
+    subtable.reserved = 0
+    subtable.nGroups = len(groups)
+    subtable.length = 16 + 12 * len(groups)
+    # The subtable is saved from its precompiled groups, and read through a mapping
+    # over them, e.g. when the OS/2 table looks up the first and last code points
+    subtable.data = b"".join(struct.pack(">LLL", first, last, glyph_ids[name]) for first, last, name in groups)
+    subtable.cmap = CodePointMap(groups)
+    subtable.ttFont = ttfont
+    cmap_table.tables.append(subtable)
+
+
+def unicode_range_bits(char_map: Dict[int, str], range_map: List[Tuple[int, int, str]]) -> Dict[str, int]:
+    """Returns the OS/2 `ulUnicodeRange` fields for the Unicode blocks that the code points touch."""
+    from fontTools.ttLib.tables.O_S_2f_2 import OS2_UNICODE_RANGES, intersectUnicodeRanges
+
+    bits = intersectUnicodeRanges(char_map)
+    for first, last, _ in range_map:
+        for bit, blocks in enumerate(OS2_UNICODE_RANGES):
+            for _, (start, stop) in blocks:
+                if first <= stop and start <= last:
+                    bits.add(bit)
+        if last >= 0x10000:
+            bits.add(57)
+
+    fields = [0, 0, 0, 0]
+    for bit in bits:
+        fields[bit // 32] |= 1 << (bit % 32)
+    return {f"ulUnicodeRange{i + 1}": value for i, value in enumerate(fields)}
+
+
+def build_baselines_ttfont(
+    font: Font, use_components=True, interpolatable=False, simplified: Optional[List["GlyphSimplification"]] = None,
+) -> TTFont:
+    """
+    Builds the font. Unless `use_components` is disabled, the border, baselines and
+    labels are stored once as base glyphs, and glyphs that show them are composites.
+
+    Fonts with masters are built as variable fonts. Static fonts built with
+    `interpolatable` have the same glyphs as any font that only differs in baseline
+    positions, so that they can be used as masters.
+
+    With a `simplified` list, overlapping rectangles are merged as the glyphs are
+    built (see `GlyphParts.finish`), and each glyph that changed is appended to
+    it. Variable fonts and interpolatable fonts are not simplified, as their masters
+    must keep the same points.
+    """
+    with tracing.span("build", font=font.name, use_components=use_components):
+        if font.masters:
+            return _build_variable_ttfont(font, use_components)
+        return _build_baselines_ttfont(font, use_components, interpolatable, None if interpolatable else simplified)
+
+
+def _master_font(font: Font, master: FontMaster) -> Font:
+    if len(master.baselines) != len(font.baselines):
+        raise ValueError(f"Master {master.name} of {font.name} has a different number of baselines")
+    for default, baseline in zip(font.baselines, master.baselines):
+        if replace(baseline, position=default.position) != default:
+            raise ValueError(
+                f"Baseline {baseline.id} of master {master.name} of {font.name} differs in more than position"
+            )
+    return replace(font, baselines=master.baselines, masters=[])
+
+
+def _build_variable_ttfont(font: Font, use_components: bool) -> TTFont:
+    from fontTools import varLib
+    from fontTools.designspaceLib import (
+        AxisDescriptor, DesignSpaceDocument, InstanceDescriptor, SourceDescriptor,
+    )
+
+    default = replace(font, masters=[])
+    masters = [("Regular", 0, default)]
+    masters += [(master.name, master.location, _master_font(default, master)) for master in font.masters]
+
+    em_sizes = set(em_size_of(master_font) for _, _, master_font in masters)
+    if len(em_sizes) != 1:
+        raise ValueError(f"Masters of {font.name} must have the same em size, but have {sorted(em_sizes)}")
+
+    document = DesignSpaceDocument()
+    axis = AxisDescriptor()
+    axis.tag = BASELINE_AXIS_TAG
+    axis.name = BASELINE_AXIS_NAME
+    axis.minimum = min(location for _, location, _ in masters)
+    axis.default = 0
+    axis.maximum = max(location for _, location, _ in masters)
+    document.addAxis(axis)
+
+    for name, location, master_font in masters:
+        source = SourceDescriptor()
+        source.name = name
+        source.font = _build_baselines_ttfont(master_font, use_components, interpolatable=True)
+        source.location = {BASELINE_AXIS_NAME: location}
+        document.addSource(source)
+
+        instance = InstanceDescriptor()
+        instance.familyName = font.name
+        instance.styleName = name
+        instance.postScriptFontName = f"{font.name}-{name}"
+        instance.location = {BASELINE_AXIS_NAME: location}
+        document.addInstance(instance)
+
+    with tracing.span("varLib"):
+        variable_font, _, _ = varLib.build(document)
+    return variable_font
+
+
+def _build_baselines_ttfont(
+    font: Font, use_components: bool, interpolatable=False, simplified: Optional[List["GlyphSimplification"]] = None,
+) -> TTFont:
     baselines = font.baselines
     ascent = next(baseline.position for baseline in baselines if baseline.id == 'ascent')
     descent = next(baseline.position for baseline in baselines if baseline.id == 'descent')
@@ -205,133 +596,440 @@ def build_baselines_font(font: Font, out_path: str):
         if baseline.id not in baseline_by_id:
             baseline_by_id[baseline.id] = baseline
 
+    with tracing.span("label_font"):
+        label_font = load_label_font(
+            "".join(baseline.label for baseline in baselines if baseline.label)
+        )
+    parts = GlyphParts(use_components, simplified)
+
+    def drawn(key: tuple, draw: Callable[[GlyphGeometry], None]) -> GlyphGeometry:
+        return cached_geometry(label_font, key, draw)
+
+    def add_border(geometry: GlyphGeometry):
+        parts.draw(geometry, ("border",), "border",
+                   drawn(("border", descent, ascent),
+                         lambda g: draw_bordered_rectangle(g, 0, descent, em_size, ascent, BORDER_WIDTH)))
+
+    def add_baseline(geometry: GlyphGeometry, baseline: FontBaseline, label, style: FontBaselineStyle):
+        y = baseline.position
+        # Parts are shared between baselines at the same position, unless the font
+        # has to be interpolatable with fonts where those positions differ
+        key = baseline.id if interpolatable else y
+        if label:
+            parts.draw(geometry, ("label", label, key), f"label.{baseline.id}",
+                       drawn(("label", label, em_size, y),
+                             lambda g: draw_text_centered(g, label_font, label, em_size / 2, y,
+                                                          font_size=50, scale_y=1, letter_gap=0)))
+        parts.draw(geometry, ("baseline", key, label, style),
+                   f"baseline.{baseline.id}.{style.stroke_style}",
+                   drawn(("baseline", label, em_size, y, style),
+                         lambda g: draw_baseline_line(g, label_font, y, em_size, label,
+                                                      style=style.stroke_style, stroke_width=style.stroke_width)))
+
     # .notdef: bordered rectangle
-    notdef_glyph_pen = TTGlyphPen(None)
-    draw_bordered_rectangle(notdef_glyph_pen, 0, descent, em_size, ascent, BORDER_WIDTH)
+    with tracing.span("glyph", glyph=".notdef"):
+        notdef_geometry = GlyphGeometry()
+        add_border(notdef_geometry)
 
     # X: all baselines with style drawn
-    diag_glyph_pen = TTGlyphPen(None)
-    draw_bordered_rectangle(diag_glyph_pen, 0, descent, em_size, ascent, BORDER_WIDTH)
+    with tracing.span("glyph", glyph="X"):
+        diag_geometry = GlyphGeometry()
+        add_border(diag_geometry)
 
-    label_font = TTFont("./support/noto/NotoSansMono-Bold.ttf")
-
-    for baseline in baselines:
-        if baseline.style:
-            draw_baseline(
-                diag_glyph_pen,
-                label_font,
-                baseline.position,
-                em_size,
-                baseline.label,
-                style=baseline.style.stroke_style,
-                stroke_width=baseline.style.stroke_width,
-            )
+        for baseline in baselines:
+            if baseline.style:
+                add_baseline(diag_geometry, baseline, baseline.label, baseline.style)
 
     glyph_order = [".notdef", "X"]
     char_map = {ord("X"): "X"}
-    glyf_table = {".notdef": notdef_glyph_pen.glyph(), "X": diag_glyph_pen.glyph()}
+    range_map: List[Tuple[int, int, str]] = []
+    glyf_table = {
+        ".notdef": parts.finish(notdef_geometry, ".notdef").glyph(),
+        "X": parts.finish(diag_geometry, "X").glyph(),
+    }
     h_metrics = {".notdef": (em_size, 0), "X": (em_size, 0)}
 
     for glyph in font.glyphs:
         cp = ord(glyph.char)
-        name = f"uni{cp:04X}" if cp <= 0xFFFF else f"u{cp:05X}"
-        pen = TTGlyphPen(None)
-
-        if glyph.kind == FontGlyphKind.EMBOX_FILLED:
-            draw_rectangle(pen, 0, descent, em_size, ascent)
-
-        elif glyph.kind == FontGlyphKind.EMBOX_OUTLINE:
-            draw_bordered_rectangle(pen, 0, descent, em_size, ascent, BORDER_WIDTH)
-
-        elif glyph.kind == FontGlyphKind.PAIR_LAYOUT:
-            b1 = baseline_by_id[glyph.baseline_ids[0]]
-            b2 = baseline_by_id[glyph.baseline_ids[1]]
-            lower = min(b1.position, b2.position)
-            upper = max(b1.position, b2.position)
-            draw_rectangle(pen, 0, lower, em_size, upper)
-
-        elif glyph.kind == FontGlyphKind.PAIR_LABELED:
-            draw_bordered_rectangle(pen, 0, descent, em_size, ascent, BORDER_WIDTH)
-            for b in baselines:
-                if b.style and b.label is None:
-                    draw_baseline(pen, label_font, b.position, em_size, None,
-                                  style=b.style.stroke_style, stroke_width=b.style.stroke_width)
-            for bid in glyph.baseline_ids:
-                b = baseline_by_id[bid]
-                style = b.style if b.style else FontBaselineStyle.SOLID
-                draw_baseline(
-                    pen,
-                    label_font,
-                    b.position,
-                    em_size,
-                    b.label,
-                    style=style.stroke_style,
-                    stroke_width=style.stroke_width,
-                )
+        name = glyph_name_for_char(glyph.char)
+        with tracing.span("glyph", glyph=name, kind=glyph.kind.name):
+            geometry = GlyphGeometry()
+
+            if glyph.kind == FontGlyphKind.EMBOX_FILLED:
+                geometry.add_geometry(drawn(("rectangle", em_size, descent, ascent),
+                                            lambda g: draw_rectangle(g, 0, descent, em_size, ascent)))
+
+            elif glyph.kind == FontGlyphKind.EMBOX_OUTLINE:
+                add_border(geometry)
+
+            elif glyph.kind == FontGlyphKind.PAIR_LAYOUT:
+                b1 = baseline_by_id[glyph.baseline_ids[0]]
+                b2 = baseline_by_id[glyph.baseline_ids[1]]
+                lower = min(b1.position, b2.position)
+                upper = max(b1.position, b2.position)
+                geometry.add_geometry(drawn(("rectangle", em_size, lower, upper),
+                                            lambda g: draw_rectangle(g, 0, lower, em_size, upper)))
+
+            elif glyph.kind == FontGlyphKind.PAIR_LABELED:
+                add_border(geometry)
+                for b in baselines:
+                    if b.style and b.label is None:
+                        add_baseline(geometry, b, None, b.style)
+                for bid in glyph.baseline_ids:
+                    b = baseline_by_id[bid]
+                    style = b.style if b.style else FontBaselineStyle.SOLID
+                    add_baseline(geometry, b, b.label, style)
+
+            glyf_table[name] = parts.finish(geometry, name).glyph()
 
         glyph_order.append(name)
         char_map[cp] = name
-        glyf_table[name] = pen.glyph()
+        range_map.extend((first, last, name) for first, last in glyph.ranges)
         h_metrics[name] = (em_size, 0)
 
-    fb = FontBuilder(em_size, isTTF=True)
-    fb.setupGlyphOrder(glyph_order)
-    fb.setupCharacterMap(char_map)
-    fb.setupGlyf(glyf_table)
-
-    os2_values = dict((base.name, base.position) for base in baselines if base.table == "OS/2")
-    hhea_values = dict((base.name, base.position) for base in baselines if base.table == "hhea")
-    vhea_values = dict((base.name, base.position) for base in baselines if base.table == "vhea")
-
-    style_name = "Regular"
-    fb.setupPost()
-    fb.setupNameTable({
-        "copyright": "Copyright (c) 2026, Sajid Anwar",
-        "familyName": font.name,
-        "styleName": style_name,
-        "uniqueFontIdentifier": f"{font.name}-{style_name}",
-        "fullName": f"{font.name}-{style_name}",
-        "psName": f"{font.name}-{style_name}",
-        "version": "Version 1.0",
-    })
-    fb.setupHorizontalMetrics(h_metrics)
-    fb.setupOS2(**os2_values)
-    fb.setupHorizontalHeader(**hhea_values)
-    fb.setupVerticalHeader(**vhea_values)
-    fb.setupHead(unitsPerEm=em_size)
-
-    bases = list(sorted(filter(lambda base: base.table == "BASE", baselines), key=lambda base: base.name))
-    base_names = list(base.name for base in bases)
-
-    base_table = otTables.BASE()
-    base_table.Version = 0x00010000
-    base_table.HorizAxis = otTables.Axis()
-    base_table.HorizAxis.BaseTagList = otTables.BaseTagList()
-    base_table.HorizAxis.BaseTagList.BaselineTag = base_names
-    base_table.HorizAxis.BaseScriptList = otTables.BaseScriptList()
-    base_table.VertAxis = otTables.Axis()
-    base_table.VertAxis.BaseTagList = otTables.BaseTagList()
-    base_table.VertAxis.BaseTagList.BaselineTag = base_names
-    base_table.VertAxis.BaseScriptList = otTables.BaseScriptList()
-
-    base_coords = []
-    for base in bases:
-        base_coord = otTables.BaseCoord()
-        base_coord.Coordinate = base.position
-        base_coord.Format = 1
-        base_coords.append(base_coord)
-
-    base_script = otTables.BaseScriptRecord()
-    base_script.BaseScriptTag = "DFLT"
-    base_script.BaseScript = otTables.BaseScript()
-    base_script.BaseScript.BaseValues = otTables.BaseValues()
-    base_script.BaseScript.BaseValues.DefaultIndex = base_names.index("romn")
-    base_script.BaseScript.BaseValues.BaseCoord = base_coords
-    base_table.HorizAxis.BaseScriptList.BaseScriptRecord = [base_script]
-    base_table.VertAxis.BaseScriptList.BaseScriptRecord = [base_script]
-    fb.font["BASE"] = newTable("BASE")
-    fb.font["BASE"].table = base_table
+    with tracing.span("glyf"):
+        for name, geometry in parts.geometries.items():
+            glyph_order.append(name)
+            glyf_table[name] = geometry.glyph()
+
+        fb = FontBuilder(em_size, isTTF=True)
+        fb.setupGlyphOrder(glyph_order)
+        fb.setupCharacterMap(char_map)
+        if range_map:
+            setup_range_cmap(fb.font, char_map, range_map)
+        fb.setupGlyf(glyf_table)
+
+        # Base glyphs are not mapped to characters, but still get metrics. Their left
+        # side bearing is wherever their outline starts.
+        for name in parts.geometries:
+            glyf_table[name].recalcBounds(fb.font["glyf"])
+            h_metrics[name] = (em_size, glyf_table[name].xMin)
+
+    with tracing.span("tables"):
+        os2_values = dict((base.name, base.position) for base in baselines if base.table == "OS/2")
+        hhea_values = dict((base.name, base.position) for base in baselines if base.table == "hhea")
+        vhea_values = dict((base.name, base.position) for base in baselines if base.table == "vhea")
+
+        style_name = "Regular"
+        fb.setupPost()
+        fb.setupNameTable({
+            "copyright": "Copyright (c) 2026, Sajid Anwar",
+            "familyName": font.name,
+            "styleName": style_name,
+            "uniqueFontIdentifier": f"{font.name}-{style_name}",
+            "fullName": f"{font.name}-{style_name}",
+            "psName": f"{font.name}-{style_name}",
+            "version": "Version 1.0",
+        })
+        fb.setupHorizontalMetrics(h_metrics)
+        if range_map:
+            # Computed from the ranges, rather than from every code point they cover
+            os2_values.update(unicode_range_bits(char_map, range_map))
+        fb.setupOS2(**os2_values)
+        fb.setupHorizontalHeader(**hhea_values)
+        fb.setupVerticalHeader(**vhea_values)
+        fb.setupHead(unitsPerEm=em_size)
+
+    with tracing.span("BASE"):
+        bases = list(sorted(filter(lambda base: base.table == "BASE", baselines), key=lambda base: base.name))
+        base_names = list(base.name for base in bases)
+
+        base_table = otTables.BASE()
+        base_table.Version = 0x00010000
+        base_table.HorizAxis = otTables.Axis()
+        base_table.HorizAxis.BaseTagList = otTables.BaseTagList()
+        base_table.HorizAxis.BaseTagList.BaselineTag = base_names
+        base_table.HorizAxis.BaseScriptList = otTables.BaseScriptList()
+        base_table.VertAxis = otTables.Axis()
+        base_table.VertAxis.BaseTagList = otTables.BaseTagList()
+        base_table.VertAxis.BaseTagList.BaselineTag = base_names
+        base_table.VertAxis.BaseScriptList = otTables.BaseScriptList()
+
+        # Each axis gets its own records, as variable font merging updates the
+        # coordinates in place
+        def base_script_record():
+            base_coords = []
+            for base in bases:
+                base_coord = otTables.BaseCoord()
+                base_coord.Coordinate = base.position
+                base_coord.Format = 1
+                base_coords.append(base_coord)
+
+            base_script = otTables.BaseScriptRecord()
+            base_script.BaseScriptTag = "DFLT"
+            base_script.BaseScript = otTables.BaseScript()
+            base_script.BaseScript.BaseValues = otTables.BaseValues()
+            base_script.BaseScript.BaseValues.DefaultIndex = base_names.index("romn")
+            base_script.BaseScript.BaseValues.BaseCoord = base_coords
+            return base_script
+
+        base_table.HorizAxis.BaseScriptList.BaseScriptRecord = [base_script_record()]
+        base_table.VertAxis.BaseScriptList.BaseScriptRecord = [base_script_record()]
+        fb.font["BASE"] = newTable("BASE")
+        fb.font["BASE"].table = base_table
+
+    return fb.font
 
+
+@dataclass
+class GlyphSimplification:
+    name: str
+    points_before: int
+    points_after: int
+    contours_before: int
+    contours_after: int
+
+
+def _contour_rectangle(coordinates: List[Point], flags: bytes) -> Optional[Rectangle]:
+    # Only counterclockwise rectangles of on-curve points, as `add_rectangles` draws
+    # them, are merged, so that holes are never filled in
+    if len(coordinates) != 4 or not all(flag & 0x01 for flag in flags):
+        return None
+    (ax, ay), (bx, by), (cx, cy), (dx, dy) = coordinates
+    if ay == by and bx == cx and cy == dy and dx == ax and ax < bx and by < cy:
+        return (ax, ay, cx, cy)
+    return None
+
+
+def _overlaps(a: Rectangle, b: Rectangle) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _intersection(a: Rectangle, b: Rectangle) -> Rectangle:
+    return (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+
+
+def _contours(geometry: GlyphGeometry) -> List[Tuple[List[Point], bytes]]:
+    contours = []
+    start = 0
+    for end in geometry.end_points:
+        xs = geometry.coordinates[2 * start:2 * end + 2:2]
+        ys = geometry.coordinates[2 * start + 1:2 * end + 2:2]
+        contours.append((list(zip(xs, ys)), bytes(geometry.flags[start:end + 1])))
+        start = end + 1
+    return contours
+
+
+def _contour_bounds(coordinates: List[Point]) -> Rectangle:
+    return (
+        min(x for x, _ in coordinates), min(y for _, y in coordinates),
+        max(x for x, _ in coordinates), max(y for _, y in coordinates),
+    )
+
+
+def _overlapping_groups(geometries: List[GlyphGeometry]) -> List[List[int]]:
+    """Groups the geometries (by index) that have rectangles overlapping each other, directly or through others."""
+    rectangles = [
+        [rect for rect in (_contour_rectangle(*contour) for contour in _contours(geometry)) if rect]
+        for geometry in geometries
+    ]
+    group_of = list(range(len(geometries)))
+
+    def find(i: int) -> int:
+        while group_of[i] != i:
+            i = group_of[i]
+        return i
+
+    for i in range(len(geometries)):
+        for j in range(i + 1, len(geometries)):
+            if find(i) != find(j) and any(_overlaps(a, b) for a in rectangles[i] for b in rectangles[j]):
+                group_of[find(j)] = find(i)
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(geometries)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values())
+
+
+def simplify_geometry(geometry: GlyphGeometry, protected: Sequence[Rectangle] = ()) -> Optional[GlyphGeometry]:
+    """
+    Returns the geometry with its overlapping and touching rectangles (borders,
+    baseline lines, and dashes drawn over each other or running into a border)
+    merged into the outline of their union, leaving out points in the middle of
+    straight edges. Collinear dashes that touch or overlap become one run. Returns
+    None if this would not leave fewer points, or as many points in fewer contours.
+
+    Rectangles that overlap each other within the bounds of another contour, such
+    as a label, or of a `protected` area, are kept as drawn, as merging them could
+    change how that contour is filled.
+    """
+    if geometry.components:
+        return None
+    rectangles: List[Rectangle] = []
+    others = []
+    for coordinates, flags in _contours(geometry):
+        rectangle = _contour_rectangle(coordinates, flags)
+        if rectangle:
+            rectangles.append(rectangle)
+        else:
+            others.append((coordinates, flags))
+    if len(rectangles) < 2:
+        return None
+
+    other_bounds = [_contour_bounds(coordinates) for coordinates, _ in others] + list(protected)
+    # Merging only changes how often an area is covered where rectangles overlap,
+    # which only matters if another contour is drawn there too
+    candidates = [i for i, rect in enumerate(rectangles) if any(_overlaps(rect, bounds) for bounds in other_bounds)]
+    kept_indices = set(
+        i for i in candidates for j in candidates
+        if i != j and _overlaps(rectangles[i], rectangles[j]) and any(
+            _overlaps(_intersection(rectangles[i], rectangles[j]), bounds) for bounds in other_bounds
+        )
+    )
+    kept = [rect for i, rect in enumerate(rectangles) if i in kept_indices]
+    merged = [rect for i, rect in enumerate(rectangles) if i not in kept_indices]
+
+    simplified = GlyphGeometry()
+    for contour in union_rectangles(merged):
+        simplified.add_contours(list(itertools.chain.from_iterable(contour)), [0x01] * len(contour),
+                                [len(contour) - 1])
+    simplified.add_rectangles(kept)
+    for coordinates, flags in others:
+        simplified.add_contours(list(itertools.chain.from_iterable(coordinates)), flags, [len(coordinates) - 1])
+
+    points_before, points_after = len(geometry.flags), len(simplified.flags)
+    if points_after > points_before or (
+        points_after == points_before and len(simplified.end_points) >= len(geometry.end_points)
+    ):
+        return None
+    return simplified
+
+
+def build_baselines_font_bytes(font: Font, flavor: Optional[str] = None) -> bytes:
+    """Builds the font in memory, as a TTF or with the given web font flavor."""
+    ttfont = build_baselines_ttfont(font)
+    ttfont.flavor = flavor
+    data = io.BytesIO()
+    with tracing.span("save", font=font.name, flavor=flavor or "ttf"):
+        ttfont.save(data)
+    return data.getvalue()
+
+
+def build_font_collection(font_paths: List[str], out_path: str):
+    """
+    Writes already built fonts into one TrueType Collection at `out_path`. Tables
+    that are byte-identical between fonts, such as `cmap`, `OS/2`, and the `glyf`
+    table of fonts with the same outlines, are stored once and shared by those fonts.
+    """
+    from fontTools.ttLib import TTCollection
+
+    collection = TTCollection()
+    separate_size = 0
+    table_counts: Dict[Tuple[str, bytes], int] = {}
+    for font_path in font_paths:
+        separate_size += os.path.getsize(font_path)
+        # Tables are copied from the saved font as they are, so that identical
+        # tables are found by their bytes
+        ttfont = TTFont(font_path)
+        for tag in ttfont.reader.keys():
+            key = (tag, ttfont.reader[tag])
+            table_counts[key] = table_counts.get(key, 0) + 1
+        collection.fonts.append(ttfont)
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with tracing.span("save", collection=out_path):
+        collection.save(out_path, shareTables=True)
+    size = os.path.getsize(out_path)
+    shared_tags = sorted(set(tag for (tag, _), count in table_counts.items() if count > 1))
+    tracing.event(
+        "font.created",
+        f"Created collection of {len(font_paths)} fonts at {out_path} ({size:,} bytes, saving "
+        f"{separate_size - size:,} bytes over separate fonts by sharing {', '.join(shared_tags) or 'no'} tables)",
+        path=out_path, size=size, separate_size=separate_size, shared_tables=shared_tags,
+    )
+
+
+def save_font_chunks(font: Font, ttfont: TTFont, out_path: str):
+    """
+    Subsets a built font into each of `FONT_CHUNKS`, saved as a TTF and as each web
+    font flavor. Component base glyphs are kept by every chunk that uses them.
+    """
+    from fontTools import subset
+
+    data = io.BytesIO()
+    ttfont.save(data)
+
+    options = subset.Options()
+    options.drop_tables = []
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.name_legacy = True
+    options.layout_features = ["*"]
+    options.notdef_outline = True
+    options.glyph_names = True
+
+    for chunk in FONT_CHUNKS:
+        codepoints = chunk_codepoints(font, chunk)
+        if not codepoints:
+            continue
+        chunk_font = TTFont(io.BytesIO(data.getvalue()))
+        with tracing.span("subset", font=font.name, chunk=chunk.name):
+            subsetter = subset.Subsetter(options)
+            subsetter.populate(unicodes=codepoints)
+            subsetter.subset(chunk_font)
+
+        for flavor in [None, *WEB_FONT_FLAVORS]:
+            chunk_path = chunk_font_path(out_path, chunk, flavor)
+            chunk_font.flavor = flavor
+            with tracing.span("save", font=font.name, chunk=chunk.name, flavor=flavor or "ttf"):
+                chunk_font.save(chunk_path)
+            chunk_size = os.path.getsize(chunk_path)
+            tracing.event(
+                "font.created",
+                f"Created {(flavor or 'ttf').upper()} {chunk.name} chunk at {chunk_path} ({chunk_size:,} bytes)",
+                path=chunk_path, size=chunk_size,
+            )
+
+
+def report_simplified(path: str, simplified: List[GlyphSimplification]):
+    if not simplified:
+        tracing.event("font.simplified", f"Kept the glyphs of {path} as drawn", path=path, glyphs=[])
+        return
+    lines = [
+        f"Simplified {len(simplified)} glyphs of {path} ("
+        f"{sum(each.points_before for each in simplified):,} -> {sum(each.points_after for each in simplified):,} points, "
+        f"{sum(each.contours_before for each in simplified):,} -> "
+        f"{sum(each.contours_after for each in simplified):,} contours)"
+    ]
+    for each in simplified:
+        lines.append(
+            f"  {each.name}: {each.points_before:,} -> {each.points_after:,} points, "
+            f"{each.contours_before:,} -> {each.contours_after:,} contours"
+        )
+    tracing.event(
+        "font.simplified", "\n".join(lines),
+        path=path, glyphs=[asdict(each) for each in simplified],
+    )
+
+
+def build_baselines_font(font: Font, out_path: str, split: bool = False, simplify: bool = False):
+    """
+    Builds the font into `out_path` and each web font flavor alongside it. With
+    `split`, the font is also saved in chunks for `unicode-range` loading. With
+    `simplify`, overlapping rectangles of each glyph are merged as it is built.
+    """
+    simplified: Optional[List[GlyphSimplification]] = [] if simplify else None
+    ttfont = build_baselines_ttfont(font, simplified=simplified)
+    if simplified is not None:
+        report_simplified(out_path, simplified)
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    fb.save(out_path)
-    print(f"Created font at {out_path}")
+    with tracing.span("save", font=font.name, flavor="ttf"):
+        ttfont.save(out_path)
+
+    size = os.path.getsize(out_path)
+    tracing.event("font.created", f"Created font at {out_path} ({size:,} bytes)", path=out_path, size=size)
+
+    for flavor in WEB_FONT_FLAVORS:
+        flavor_path = web_font_path(out_path, flavor)
+        ttfont.flavor = flavor
+        with tracing.span("save", font=font.name, flavor=flavor):
+            ttfont.save(flavor_path)
+        flavor_size = os.path.getsize(flavor_path)
+        tracing.event(
+            "font.created",
+            f"Created {flavor.upper()} font at {flavor_path} ({flavor_size:,} bytes)",
+            path=flavor_path, size=flavor_size,
+        )
+    ttfont.flavor = None
+
+    if split:
+        save_font_chunks(font, ttfont, out_path)
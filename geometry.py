@@ -0,0 +1,175 @@
+from array import array
+from itertools import chain, cycle
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from fontTools.misc.roundTools import otRound
+from fontTools.ttLib.tables import ttProgram
+from fontTools.ttLib.tables._g_l_y_f import ROUND_XY_TO_GRID, Glyph, GlyphComponent, GlyphCoordinates
+
+ON_CURVE = 0x01
+
+Rectangle = Tuple[float, float, float, float]
+Point = Tuple[float, float]
+
+
+class GlyphGeometry:
+    """
+    Collects glyph contours as flat coordinate, flag and end point arrays, and
+    builds a `glyf` glyph from them in one go instead of point by point through a
+    pen. Alternatively collects references to other glyphs, to build a composite
+    glyph.
+
+    Coordinates are rounded as they are added, so that a drawn geometry can be
+    added to others (see `add_geometry`) without being rounded again. Geometries
+    shared between glyphs are frozen, after which adding to them raises an error.
+    """
+
+    def __init__(self):
+        self.coordinates = array("d")
+        self.flags = array("B")
+        self.end_points = []
+        self.components = []
+        self.frozen = False
+
+    def freeze(self) -> "GlyphGeometry":
+        """Makes the geometry read-only, and returns it."""
+        self.coordinates = tuple(self.coordinates)
+        self.flags = bytes(self.flags)
+        self.end_points = tuple(self.end_points)
+        self.components = tuple(self.components)
+        self.frozen = True
+        return self
+
+    def _check_mutable(self):
+        if self.frozen:
+            raise ValueError("Cannot add to a frozen geometry")
+
+    def add_rectangles(self, rectangles: Iterable[Rectangle]):
+        self._check_mutable()
+        rectangles = list(rectangles)
+        if not rectangles:
+            return
+        start = len(self.flags)
+        self.coordinates.extend(map(otRound, chain.from_iterable(
+            (x1, y1, x2, y1, x2, y2, x1, y2) for x1, y1, x2, y2 in rectangles
+        )))
+        self.flags.extend(bytes([ON_CURVE]) * (4 * len(rectangles)))
+        self.end_points.extend(range(start + 3, start + 4 * len(rectangles), 4))
+
+    def add_contours(
+        self, coordinates: Sequence[float], flags: Sequence[int], end_points: Sequence[int], dx=0.0, dy=0.0
+    ):
+        """Adds contours given as flat arrays, translated by (dx, dy)."""
+        self._check_mutable()
+        start = len(self.flags)
+        if dx or dy:
+            self.coordinates.extend(otRound(value + offset) for value, offset in zip(coordinates, cycle((dx, dy))))
+        else:
+            self.coordinates.extend(map(otRound, coordinates))
+        self.flags.extend(flags)
+        self.end_points.extend(start + end_point for end_point in end_points)
+
+    def add_geometry(self, other: "GlyphGeometry"):
+        """Adds the contours and components of another geometry, which is left unchanged."""
+        self._check_mutable()
+        start = len(self.flags)
+        self.coordinates.extend(other.coordinates)
+        self.flags.extend(other.flags)
+        self.end_points.extend(start + end_point for end_point in other.end_points)
+        self.components.extend(other.components)
+
+    def add_component(self, glyph_name: str):
+        """Adds a reference to another glyph, drawn at its own coordinates."""
+        self._check_mutable()
+        self.components.append(glyph_name)
+
+    def glyph(self) -> Glyph:
+        glyph = Glyph()
+        if self.components:
+            if self.end_points:
+                raise ValueError("Glyph cannot have both contours and components")
+            glyph.components = []
+            for glyph_name in self.components:
+                component = GlyphComponent()
+                component.glyphName = glyph_name
+                component.x = 0
+                component.y = 0
+                component.flags = ROUND_XY_TO_GRID
+                glyph.components.append(component)
+            glyph.numberOfContours = -1
+            return glyph
+
+        glyph.coordinates = GlyphCoordinates()
+        glyph.coordinates.array.extend(self.coordinates)
+        glyph.flags = array("B", self.flags)
+        glyph.endPtsOfContours = list(self.end_points)
+        glyph.numberOfContours = len(glyph.endPtsOfContours)
+        glyph.program = ttProgram.Program()
+        glyph.program.fromBytecode(b"")
+        return glyph
+
+
+def union_rectangles(rectangles: Sequence[Rectangle]) -> List[List[Point]]:
+    """
+    Returns the outline of the union of axis-aligned rectangles, as contours of
+    corner points. Like the contours of `add_rectangles`, filled areas are on the
+    left of each contour, so outer contours run counterclockwise and holes
+    clockwise. Points in the middle of a straight edge are left out.
+    """
+    xs = sorted(set(chain.from_iterable((x1, x2) for x1, _, x2, _ in rectangles)))
+    ys = sorted(set(chain.from_iterable((y1, y2) for _, y1, _, y2 in rectangles)))
+    x_index = {x: i for i, x in enumerate(xs)}
+    y_index = {y: j for j, y in enumerate(ys)}
+
+    # Cells between consecutive distinct coordinates, by row, that any rectangle covers
+    columns = len(xs) - 1
+    covered = [bytearray(columns + 2) for _ in range(len(ys) + 1)]
+    for x1, y1, x2, y2 in rectangles:
+        i1, i2 = x_index[x1] + 1, x_index[x2] + 1
+        for j in range(y_index[y1] + 1, y_index[y2] + 1):
+            covered[j][i1:i2] = b"\x01" * (i2 - i1)
+
+    # Each cell side between a covered and an uncovered cell is an edge, directed
+    # so that the covered cell is on its left
+    edges: Dict[Point, List[Point]] = {}
+    for j in range(1, len(ys)):
+        row, below, above = covered[j], covered[j - 1], covered[j + 1]
+        y1, y2 = ys[j - 1], ys[j]
+        for i in range(1, columns + 1):
+            if not row[i]:
+                continue
+            x1, x2 = xs[i - 1], xs[i]
+            if not below[i]:
+                edges.setdefault((x1, y1), []).append((x2, y1))
+            if not row[i + 1]:
+                edges.setdefault((x2, y1), []).append((x2, y2))
+            if not above[i]:
+                edges.setdefault((x2, y2), []).append((x1, y2))
+            if not row[i - 1]:
+                edges.setdefault((x1, y2), []).append((x1, y1))
+
+    # Every point has as many edges in as out, so following edges from any point
+    # always leads back to it. Where two outlines touch at a corner, either way
+    # of joining them fills the same area.
+    contours = []
+    while edges:
+        start = point = next(iter(edges))
+        points = []
+        while True:
+            points.append(point)
+            ends = edges[point]
+            end = ends.pop()
+            if not ends:
+                del edges[point]
+            point = end
+            if point == start:
+                break
+        contours.append([
+            point for k, point in enumerate(points)
+            if not _is_collinear(points[k - 1], point, points[(k + 1) % len(points)])
+        ])
+    return contours
+
+
+def _is_collinear(previous: Point, point: Point, following: Point) -> bool:
+    return previous[0] == point[0] == following[0] or previous[1] == point[1] == following[1]
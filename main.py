@@ -1,162 +1,403 @@
+import time
+
+# Taken before anything else is imported, to report how long startup takes
+IMPORT_START = time.perf_counter()
+
+import argparse
+import json
+import os
 import re
-from font import Font, FontBaseline, FontBaselineStyle, FontGlyph, FontGlyphKind, build_baselines_font
-from jinja2 import Environment, FileSystemLoader
+import metrics as metrics_module
+import model as model_module
+import sys
+import tracing
+from functools import cache
+from metrics import font_metrics, metrics_paths, write_metrics
+from model import (
+    BASELINE_AXIS_TAG, FONT_CHUNKS, WEB_FONT_FLAVORS, Font, FontBaseline, FontGlyph, FontGlyphKind,
+    chunk_codepoints, chunk_font_path, chunk_font_paths, web_font_path,
+)
+from scheduler import BuildTarget, content_hash, file_hash, job_count, module_hash, run_build
+from specs import FONTS_DIR, SpecError, load_fonts, spec_paths
 from textwrap import dedent, indent
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
 
 AUTHOR = "Sajid Anwar"
+MANIFEST_PATH = "dist/.build-manifest.json"
+COLLECTION_PATH = "dist/baseline-diagnostic-font.ttc"
+STYLESHEET_NAME = "baseline-diagnostic-font.css"
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+TEMPLATES_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jinja")
+
+# Groups of outputs that can be built on their own. Only the fonts need fontTools,
+# and only the HTML and README (with the license) need Jinja, so the other
+# commands start without importing either.
+OUTPUT_GROUPS = ["fonts", "metrics", "css", "html", "readme"]
+COMMANDS = [*OUTPUT_GROUPS, "all"]
+HEAVY_MODULES = ["fontTools", "jinja2"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds the baseline diagnostic fonts into the dist folder.")
+    parser.add_argument("command", nargs="?", default="all", choices=COMMANDS,
+                        help="outputs to build (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=job_count, default=None,
+                        help="number of build processes to use (default: number of CPUs)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="rebuild all outputs, even those whose inputs are unchanged")
+    parser.add_argument("--split", action="store_true",
+                        help="also write each font in unicode-range chunks, and load those from the stylesheet")
+    parser.add_argument("--collection", action="store_true",
+                        help=f"also write all fonts into one collection at {COLLECTION_PATH}, sharing identical tables")
+    parser.add_argument("--simplify", action="store_true",
+                        help="merge overlapping rectangles in each glyph, and report the points and contours saved")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record the duration of each build stage into a Chrome/Perfetto trace file")
+    parser.add_argument("--fonts", metavar="DIR", default=FONTS_DIR,
+                        help="directory of font spec files to build (default: fonts)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running, and rebuild whenever a font spec or template changes")
+    parser.add_argument("--sweep", metavar="DIR",
+                        help="with the css command, write a stylesheet for the fonts of a sweep directory instead")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="report the startup time, and which heavy modules each command imported")
+    args = parser.parse_args(argv)
+    if args.sweep and args.command != "css":
+        parser.error("--sweep is only supported by the css command")
+
+    if args.verbose:
+        report_startup("Started")
+    if args.trace:
+        tracing.enable()
+
+    outputs = OUTPUT_GROUPS if args.command == "all" else [args.command]
+    if args.sweep:
+        write_sweep_stylesheet(args.sweep, args.fonts)
+    elif args.watch:
+        os.makedirs("dist", exist_ok=True)
+        watch(args.fonts, split=args.split, simplify=args.simplify, collection=args.collection, outputs=outputs)
+        return
+    else:
+        os.makedirs("dist", exist_ok=True)
+        try:
+            fonts = load_fonts(spec_paths(args.fonts))
+        except SpecError as e:
+            sys.exit(f"Invalid font spec: {e}")
+        run_build(
+            build_targets(fonts, split=args.split, simplify=args.simplify, collection=args.collection, outputs=outputs),
+            jobs=args.jobs, manifest_path=MANIFEST_PATH, force=args.force,
+        )
+    if args.verbose:
+        report_startup("Finished")
+
+    if args.trace:
+        events = tracing.take_events()
+        tracing.write_trace(args.trace, events)
+        print(tracing.summary(events), file=sys.stderr)
+        print(f"Wrote trace at {args.trace}", file=sys.stderr)
+
+
+def report_startup(stage: str):
+    elapsed = (time.perf_counter() - IMPORT_START) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"{stage} in {elapsed:.1f} ms, with {', '.join(loaded) or 'no heavy modules'} imported", file=sys.stderr)
+
+
+def default_fonts() -> List[Font]:
+    """Returns the fonts of the spec files in `fonts/`."""
+    return load_fonts()
+
+
+def watched_files(fonts_dir: str) -> Dict[str, int]:
+    paths = [*spec_paths(fonts_dir), *(os.path.join(TEMPLATES_DIR, name) for name in os.listdir(TEMPLATES_DIR))]
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return mtimes
+
 
-def main():
-    glyphs = [
-        FontGlyph("x", FontGlyphKind.PAIR_LAYOUT,  ["x-height", "alphabetic"]),
-        FontGlyph("χ", FontGlyphKind.PAIR_LABELED, ["x-height", "alphabetic"]),
-        FontGlyph("B", FontGlyphKind.PAIR_LAYOUT,  ["cap-height", "alphabetic"]),
-        FontGlyph("β", FontGlyphKind.PAIR_LABELED, ["cap-height", "alphabetic"]),
-        FontGlyph("口", FontGlyphKind.PAIR_LAYOUT,  ["ideographic-over", "ideographic-under"]),
-        FontGlyph("日", FontGlyphKind.PAIR_LABELED, ["ideographic-over", "ideographic-under"]),
-        FontGlyph("中", FontGlyphKind.PAIR_LAYOUT,  ["ideographic-face-over", "ideographic-face-under"]),
-        FontGlyph("田", FontGlyphKind.PAIR_LABELED, ["ideographic-face-over", "ideographic-face-under"]),
-        FontGlyph("अ", FontGlyphKind.PAIR_LAYOUT,  ["hanging", "alphabetic"]),
-        FontGlyph("आ", FontGlyphKind.PAIR_LABELED, ["hanging", "alphabetic"]),
-        FontGlyph("+", FontGlyphKind.PAIR_LAYOUT,  ["math", "alphabetic"]),
-        FontGlyph("±", FontGlyphKind.PAIR_LABELED, ["math", "alphabetic"]),
-        FontGlyph("█", FontGlyphKind.EMBOX_FILLED),
-        FontGlyph("□", FontGlyphKind.EMBOX_OUTLINE),
-    ]
-
-    fonts = []
-    fonts.append(Font(
-        name="BaselineDiagnostic",
-        description=(dedent("""\
-            Font that can be used for validating baseline alignments. Given the embedded
-            text in the font, this should be used with very large font sizes. There are
-            two glyphs in the font.""")),
-        baselines=[
-            FontBaseline("ascent",                    800,   "OS/2", "sTypoAscender",  None,                  None),
-            FontBaseline("ascent",                    800,   "hhea", "ascent",         None,                  None),
-            FontBaseline("ascent",                    800,   "vhea", "ascent",         None,                  None),
-            FontBaseline("ideographic-over",          750,   "BASE", "idtp",           "IDEOGRAPHIC-OVER",    FontBaselineStyle.SOLID),
-            FontBaseline("hanging",                   650,   "BASE", "hang",           "HANGING",             FontBaselineStyle.SOLID),
-            FontBaseline("ideographic-face-over",     650,   "BASE", "icft",           "IDEO-FACE-OVER",      None),
-            FontBaseline("cap-height",                550,   "OS/2", "sCapHeight",     "CAP-HEIGHT",          FontBaselineStyle.SOLID),
-            FontBaseline("math",                      450,   "BASE", "math",           "MATH",                FontBaselineStyle.SOLID),
-            FontBaseline("central",                   350,   None,   None,             "CENTRAL",             FontBaselineStyle.SOLID),
-            FontBaseline("em-middle",                 300,   None,   None,             None,                  FontBaselineStyle.DASHED),
-            FontBaseline("x-height",                  250,   "OS/2", "sxHeight",       "X-HEIGHT",            FontBaselineStyle.SOLID),
-            FontBaseline("x-middle",                  150,   None,   None,             "X-MIDDLE",            FontBaselineStyle.SOLID),
-            FontBaseline("alphabetic",                 50,   "BASE", "romn",           "ALPHABETIC",          FontBaselineStyle.SOLID),
-            FontBaseline("ideographic-face-under",     50,   "BASE", "icfb",           "IDEO-FACE-UNDER",     None),
-            FontBaseline("zero",                        0,   None,   None,             None,                  FontBaselineStyle.DASHED),
-            FontBaseline("ideographic-under",         -50,   "BASE", "ideo",           "IDEOGRAPHIC-UNDER",   FontBaselineStyle.SOLID),
-            FontBaseline("descent",                  -200,   "OS/2", "sTypoDescender", None,                  None),
-            FontBaseline("descent",                  -200,   "hhea", "descent",        None,                  None),
-            FontBaseline("descent",                  -200,   "vhea", "descent",        None,                  None),
-        ],
-        glyphs=glyphs,
-    ))
-    fonts.append(Font(
-        name="BaselineDiagnosticAlphabeticZero",
-        description=(dedent("""\
-            Same as the "BaselineDiagnostic" font, but uses the common alphabetic baseline
-            of 0. This also results in the x-middle baseline being at 125.""")),
-        baselines=[
-            FontBaseline("ascent",                    800,   "OS/2", "sTypoAscender",  None,                  None),
-            FontBaseline("ascent",                    800,   "hhea", "ascent",         None,                  None),
-            FontBaseline("ascent",                    800,   "vhea", "ascent",         None,                  None),
-            FontBaseline("ideographic-over",          750,   "BASE", "idtp",           "IDEOGRAPHIC-OVER",    FontBaselineStyle.SOLID),
-            FontBaseline("hanging",                   650,   "BASE", "hang",           "HANGING",             FontBaselineStyle.SOLID),
-            FontBaseline("ideographic-face-over",     650,   "BASE", "icft",           "IDEO-FACE-OVER",      None),
-            FontBaseline("cap-height",                550,   "OS/2", "sCapHeight",     "CAP-HEIGHT",          FontBaselineStyle.SOLID),
-            FontBaseline("math",                      450,   "BASE", "math",           "MATH",                FontBaselineStyle.SOLID),
-            FontBaseline("central",                   350,   None,   None,             "CENTRAL",             FontBaselineStyle.SOLID),
-            FontBaseline("em-middle",                 300,   None,   None,             None,                  FontBaselineStyle.DASHED),
-            FontBaseline("x-height",                  250,   "OS/2", "sxHeight",       "X-HEIGHT",            FontBaselineStyle.SOLID),
-            FontBaseline("x-middle",                  125,   None,   None,             "X-MIDDLE",            FontBaselineStyle.SOLID),
-            FontBaseline("alphabetic",                  0,   "BASE", "romn",           None,                  FontBaselineStyle.DASHED),
-            FontBaseline("ideographic-face-under",     50,   "BASE", "icfb",           "IDEO-FACE-UNDER",     None),
-            FontBaseline("zero",                        0,   None,   None,             None,                  None),
-            FontBaseline("ideographic-under",         -50,   "BASE", "ideo",           "IDEOGRAPHIC-UNDER",   FontBaselineStyle.SOLID),
-            FontBaseline("descent",                  -200,   "OS/2", "sTypoDescender", None,                  None),
-            FontBaseline("descent",                  -200,   "hhea", "descent",        None,                  None),
-            FontBaseline("descent",                  -200,   "vhea", "descent",        None,                  None),
-        ],
-        glyphs=glyphs,
-    ))
-
-    write_font_files(fonts)
-    write_font_stylesheet(fonts)
-    write_font_html(fonts)
-    write_font_readme(fonts)
-    write_font_license()
-
-
-def write_font_files(fonts: List[Font]):
+def watch(
+    fonts_dir: str = FONTS_DIR, split: bool = False, simplify: bool = False, collection: bool = False,
+    interval: float = 0.1, outputs: Sequence[str] = OUTPUT_GROUPS,
+):
+    """
+    Rebuilds whenever a font spec or template changes, until interrupted. Builds
+    run in this process, so that the label font, glyph outlines and compiled
+    templates stay loaded between them, and only targets whose inputs changed
+    are rebuilt. Changes to the Python code itself need a restart.
+    """
+    snapshot = None
+    try:
+        while True:
+            current = watched_files(fonts_dir)
+            if current != snapshot:
+                snapshot = current
+                start = time.perf_counter()
+                try:
+                    fonts = load_fonts(spec_paths(fonts_dir))
+                    targets = build_targets(
+                        fonts, split=split, simplify=simplify, collection=collection, outputs=outputs,
+                    )
+                    run_build(targets, jobs=1, manifest_path=MANIFEST_PATH, report_skipped=False)
+                except SpecError as e:
+                    print(f"Invalid font spec: {e}", file=sys.stderr)
+                except Exception as e:
+                    # A broken template or spec should not end the watch
+                    print(f"Build failed: {type(e).__name__}: {e}", file=sys.stderr)
+                else:
+                    elapsed = time.perf_counter() - start
+                    print(f"Built in {elapsed * 1000:.0f} ms, watching {fonts_dir} and {TEMPLATES_DIR} for changes",
+                          file=sys.stderr)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def build_targets(
+    fonts: List[Font], split: bool = False, simplify: bool = False, collection: bool = False,
+    outputs: Sequence[str] = OUTPUT_GROUPS,
+) -> List[BuildTarget]:
+    """Returns the targets of the given `OUTPUT_GROUPS`, importing fontTools only to build fonts."""
+    targets = []
+    if "fonts" in outputs:
+        import fontTools
+        import font as font_module
+        from font import build_baselines_font, build_font_collection
+
+        # Everything a font depends on besides its spec: the builder code and the
+        # project modules it uses, the label font, and the fontTools version that
+        # serializes the tables.
+        builder_hash = content_hash(
+            module_hash(font_module),
+            file_hash(font_module.LABEL_FONT_PATH),
+            fontTools.version,
+        )
+        for font in fonts:
+            out_path = f'dist/{font.name}.ttf'
+            targets.append(BuildTarget(
+                f"font:{font.name}", build_baselines_font, (font, out_path, split, simplify),
+                outputs=[
+                    out_path,
+                    *(web_font_path(out_path, flavor) for flavor in WEB_FONT_FLAVORS),
+                    *(chunk_font_paths(font, out_path) if split else []),
+                ],
+                input_hash=content_hash(builder_hash, repr(font), str(simplify)),
+            ))
+        if collection:
+            targets.append(BuildTarget(
+                "collection", build_font_collection, ([f"dist/{font.name}.ttf" for font in fonts], COLLECTION_PATH),
+                deps=[f"font:{font.name}" for font in fonts],
+                outputs=[COLLECTION_PATH],
+                input_hash=content_hash(builder_hash),
+            ))
+    if "metrics" in outputs:
+        targets.append(BuildTarget(
+            "metrics", write_font_metrics, (fonts,),
+            outputs=[path for font in fonts for path in metrics_paths(f"dist/{font.name}.ttf")],
+            input_hash=content_hash(module_hash(metrics_module, model_module), repr(fonts)),
+        ))
+    if "css" in outputs:
+        targets.append(BuildTarget(
+            "css", write_font_stylesheet, (fonts, split),
+            outputs=[f"dist/{STYLESHEET_NAME}"],
+            input_hash=content_hash(module_hash(sys.modules[__name__]), repr(fonts), str(split)),
+        ))
+
+    context = BuildContext(fonts)
+
+    def template_hash(name, data):
+        return content_hash(file_hash(os.path.join(TEMPLATES_DIR, name)), data)
+
+    if "html" in outputs:
+        targets.append(BuildTarget(
+            "html", write_font_html, (context,),
+            outputs=["dist/index.html"], input_hash=template_hash('index.html.jinja', context.template_json),
+        ))
+    if "readme" in outputs:
+        targets.append(BuildTarget(
+            "readme", write_font_readme, (context,),
+            outputs=["dist/README.md"], input_hash=template_hash('README.md.jinja', context.template_json),
+        ))
+        targets.append(BuildTarget(
+            "license", write_font_license, (context,),
+            outputs=["dist/LICENSE.md"], input_hash=template_hash('LICENSE.md.jinja', AUTHOR),
+        ))
+    return targets
+
+
+def write_font_metrics(fonts: List[Font]):
+    """
+    Writes the baseline positions and glyphs of each font next to it, as JSON and
+    in the binary form of `metrics.py`, for harnesses that should not parse fonts.
+    """
     for font in fonts:
-        build_baselines_font(font, f'dist/{font.name}.ttf')
+        json_path, bin_path = metrics_paths(f"dist/{font.name}.ttf")
+        write_metrics([font_metrics(font)], json_path, bin_path)
+        tracing.event(
+            "output.written", f"Wrote metrics at {json_path} and {bin_path}", path=json_path, bin_path=bin_path,
+        )
 
 
-def write_font_stylesheet(fonts: List[Font]):
-    out_path = "dist/baseline-diagnostic-font.css"
+def write_font_stylesheet(fonts: List[Font], split: bool = False, out_path: str = f"dist/{STYLESHEET_NAME}"):
+    """
+    Writes the `@font-face` rules and baseline position variables of the fonts.
+    With `split`, each font has one rule per chunk, limited to the chunk's glyphs
+    with `unicode-range`, so that browsers only download the chunks a page uses.
+    """
     with open(out_path, "w") as f:
-        for font in fonts:
-            template = dedent('''
-                @font-face {{
-                  /**
-                {description}
-                   */
-                  font-family: "{name}";
-                  src: url('./{name}.ttf') format('opentype');
-                }}
-
-                :root {{
-                  /**
-                   * Variables representing the positions of the given baselines/metrics from the top
-                   * of the em-box as a percentage of the em-height. The top of the em-box (ascent) has
-                   * a position of 0, and the bottom of the em-box (descent) has a position of 1.
-                   */
-                {variables}
-                }}
-            ''')
-            description = indent(font.description, '   * ')
-            positions: Dict[str, int] = {}
-            ascent = None
-            descent = None
-
-            for baseline in font.baselines:
-                if baseline.id in positions and positions[baseline.id] != baseline.position:
-                    raise ValueError(f"Baseline metric {baseline.id} has different position values")
-                if baseline.id == 'ascent':
-                    ascent = baseline.position
-                if baseline.id == 'descent':
-                    descent = -1 * baseline.position
-                positions[baseline.id] = baseline.position
-
-            if not ascent or not descent:
-                raise ValueError(f"Required ascent / descent but got {ascent} / {descent}")
-
-            variables = []
-            for baseline, position in positions.items():
-                variables.append(
-                    "--{font_name}-{baseline}: calc(1 - ({position} + {descent}) / {height});".format(
-                        font_name=dashing(font.name),
-                        baseline=baseline,
-                        position=position,
-                        descent=descent,
-                        height=(ascent + descent),
-                    )
-                )
+        f.write(font_stylesheet(fonts, split))
+    tracing.event("output.written", f"Wrote stylesheet at {out_path}", path=out_path)
+
 
-            f.write(template.format(
-                name=font.name,
-                description=description,
-                variables=indent('\n'.join(variables), '  '),
+def font_stylesheet(fonts: List[Font], split: bool = False, flavors: Sequence[str] = WEB_FONT_FLAVORS) -> str:
+    """
+    Returns the stylesheet of `write_font_stylesheet`, loading each font from its
+    web font `flavors` in order, and then from its TTF.
+    """
+    rules = []
+    for font in fonts:
+        template = dedent('''
+            {faces}
+
+            :root {{
+              /**
+               * Variables representing the positions of the given baselines/metrics from the top
+               * of the em-box as a percentage of the em-height. The top of the em-box (ascent) has
+               * a position of 0, and the bottom of the em-box (descent) has a position of 1.
+               */
+            {variables}
+            }}
+        ''')
+        face_template = dedent('''\
+            @font-face {{
+              /**
+            {description}
+               */
+              font-family: "{name}";
+              src: {sources};{unicode_range}
+            }}''')
+        description = indent(font.description, '   * ')
+
+        def sources(file: str) -> str:
+            return ",\n       ".join([
+                *(f"url('./{file}.{flavor}') format('{flavor}')" for flavor in flavors),
+                f"url('./{file}.ttf') format('opentype')",
+            ])
+
+        faces = []
+        if split:
+            for chunk in FONT_CHUNKS:
+                codepoints = chunk_codepoints(font, chunk)
+                if codepoints:
+                    faces.append(face_template.format(
+                        name=font.name,
+                        description=description,
+                        sources=sources(os.path.splitext(chunk_font_path(font.name, chunk))[0]),
+                        unicode_range=f"\n  unicode-range: {unicode_range(codepoints)};",
+                    ))
+        else:
+            faces.append(face_template.format(
+                name=font.name, description=description, sources=sources(font.name), unicode_range="",
             ))
-        print(f"Wrote stylesheet at {out_path}")
+
+        variables = stylesheet_variables(dashing(font.name), font.baselines)
+        for master in font.masters:
+            variables.append('')
+            variables.append(
+                f'/* {master.name}, selected with font-variation-settings: "{BASELINE_AXIS_TAG}" {master.location:g} */'
+            )
+            variables.extend(stylesheet_variables(f'{dashing(font.name)}-{dashing(master.name)}', master.baselines))
+
+        rules.append(template.format(
+            faces='\n\n'.join(faces),
+            variables=indent('\n'.join(variables), '  '),
+        ))
+    return "".join(rules)
+
+
+def write_sweep_stylesheet(sweep_dir: str, fonts_dir: str = FONTS_DIR):
+    """
+    Writes a stylesheet for the fonts of a sweep directory into it, rebuilding each
+    variant's spec from the sweep index rather than reading the fonts, so that it
+    does not import fontTools. Sweeps only hold TTFs, so only those are loaded.
+    """
+    from sweep import read_index, variant_from_params
+
+    if sweep_dir.endswith(".zip"):
+        sys.exit("Stylesheets can only be written for sweep directories, not archives")
+    try:
+        bases = {font.name: font for font in load_fonts(spec_paths(fonts_dir))}
+    except SpecError as e:
+        sys.exit(f"Invalid font spec: {e}")
+    variants = []
+    for entry in read_index(sweep_dir):
+        if entry["base"] not in bases:
+            sys.exit(f"Sweep font {entry['file']} is based on {entry['base']}, which has no spec in {fonts_dir}")
+        try:
+            variants.append(variant_from_params(bases[entry["base"]], entry["name"], entry["params"]))
+        except ValueError as e:
+            sys.exit(f"Invalid sweep font {entry['file']}: {e}")
+    out_path = os.path.join(sweep_dir, STYLESHEET_NAME)
+    with open(out_path, "w") as f:
+        f.write(font_stylesheet(variants, flavors=[]))
+    tracing.event("output.written", f"Wrote stylesheet for {len(variants):,} fonts at {out_path}", path=out_path)
+
+
+def unicode_range(codepoints: List[int]) -> str:
+    """Formats sorted code points as a CSS `unicode-range`, joining consecutive runs."""
+    ranges = []
+    for cp in codepoints:
+        if ranges and ranges[-1][1] == cp - 1:
+            ranges[-1][1] = cp
+        else:
+            ranges.append([cp, cp])
+    return ", ".join(f"U+{start:X}" if start == end else f"U+{start:X}-{end:X}" for start, end in ranges)
+
+
+def stylesheet_variables(prefix: str, baselines: List[FontBaseline]) -> List[str]:
+    positions: Dict[str, int] = {}
+    ascent = None
+    descent = None
+
+    for baseline in baselines:
+        if baseline.id in positions and positions[baseline.id] != baseline.position:
+            raise ValueError(f"Baseline metric {baseline.id} has different position values")
+        if baseline.id == 'ascent':
+            ascent = baseline.position
+        if baseline.id == 'descent':
+            descent = -1 * baseline.position
+        positions[baseline.id] = baseline.position
+
+    if not ascent or not descent:
+        raise ValueError(f"Required ascent / descent but got {ascent} / {descent}")
+
+    variables = []
+    for baseline, position in positions.items():
+        variables.append(
+            "--{prefix}-{baseline}: calc(1 - ({position} + {descent}) / {height});".format(
+                prefix=prefix,
+                baseline=baseline,
+                position=position,
+                descent=descent,
+                height=(ascent + descent),
+            )
+        )
+    return variables
 
 
 def prepare_template_data(fonts: List[Font]) -> dict:
+    """
+    Returns the data of the documentation templates. The first font is described in
+    full, and every other font as the baselines that it moves relative to the first.
+    Fonts that move no baselines, like a variable font at its default, are skipped.
+    """
     font = fonts[0]
-    font_az = fonts[1]
 
     dfn_tooltips = {
         'central':   'Computed at halfway between ideographic-under and ideographic-over',
@@ -176,14 +417,17 @@ def prepare_template_data(fonts: List[Font]) -> dict:
         elif b.table == 'OS/2': seen[b.id]['os2']  = b.name
         elif b.table == 'hhea': seen[b.id]['hhea'] = b.name
 
-    az_positions = {}
-    for b in font_az.baselines:
-        if b.id not in az_positions:
-            az_positions[b.id] = b.position
-    az_diffs = [{'id': e['id'], 'position': az_positions[e['id']]}
-                for e in baseline_table
-                if e['id'] in az_positions and az_positions[e['id']] != e['position']]
-    az_diffs.sort(key=lambda baseline: baseline['id'])
+    variants = []
+    for other in fonts[1:]:
+        other_positions: Dict[str, int] = {}
+        for b in other.baselines:
+            other_positions.setdefault(b.id, b.position)
+        diffs = [{'id': e['id'], 'position': other_positions[e['id']]}
+                 for e in baseline_table
+                 if e['id'] in other_positions and other_positions[e['id']] != e['position']]
+        diffs.sort(key=lambda baseline: baseline['id'])
+        if diffs:
+            variants.append({'name': other.name, 'diffs': diffs})
 
     pair_map: Dict[tuple, dict] = {}
     pair_order = []
@@ -193,56 +437,109 @@ def prepare_template_data(fonts: List[Font]) -> dict:
             if key not in pair_map:
                 pair_map[key] = {'ids': list(key), 'layout': None, 'labeled': None}
                 pair_order.append(key)
-            glyph_data = {'char': g.char, 'codepoint': f'U+{ord(g.char):04X}'}
+            glyph_data = {'char': g.char, 'codepoint': glyph_codepoints(g)}
             if g.kind == FontGlyphKind.PAIR_LAYOUT:   pair_map[key]['layout']  = glyph_data
             elif g.kind == FontGlyphKind.PAIR_LABELED: pair_map[key]['labeled'] = glyph_data
 
     def embox_data(kind):
         g = next((g for g in font.glyphs if g.kind == kind), None)
-        return {'char': g.char, 'codepoint': f'U+{ord(g.char):04X}'} if g else None
+        return {'char': g.char, 'codepoint': glyph_codepoints(g)} if g else None
 
     return {
         'font_name':    font.name,
-        'font_az_name': font_az.name,
+        'font_names':   [font.name, *(variant['name'] for variant in variants)],
         'baseline_table': baseline_table,
-        'az_diffs':     az_diffs,
+        'variants':     variants,
         'pairs':        [pair_map[k] for k in pair_order],
         'embox_filled':  embox_data(FontGlyphKind.EMBOX_FILLED),
         'embox_outline': embox_data(FontGlyphKind.EMBOX_OUTLINE),
     }
 
 
-def _jinja_env():
-    return Environment(loader=FileSystemLoader('templates'), trim_blocks=True, lstrip_blocks=True)
+def glyph_codepoints(glyph: FontGlyph) -> str:
+    """Formats the code point of a glyph, followed by any ranges that share its outline."""
+    return ', '.join([
+        f'U+{ord(glyph.char):04X}',
+        *(f'U+{first:04X}–U+{last:04X}' for first, last in glyph.ranges),
+    ])
+
+
+@cache
+def _jinja_env() -> "Environment":
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    # Compiled templates are cached on disk, so later builds skip parsing them
+    os.makedirs(TEMPLATES_CACHE_DIR, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATES_CACHE_DIR),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+
+
+class BuildContext:
+    """
+    State shared by the documentation outputs of a build: the template data, which
+    is computed once on first use, and the templates, which are compiled once per
+    process. Contexts are picklable, so that outputs can be written by workers.
+    """
+
+    def __init__(self, fonts: List[Font]):
+        self.fonts = fonts
+        self._template_data: Optional[dict] = None
 
+    @property
+    def template_data(self) -> dict:
+        if self._template_data is None:
+            self._template_data = prepare_template_data(self.fonts)
+        return self._template_data
 
-def write_font_html(fonts: List[Font]):
+    @property
+    def template_json(self) -> str:
+        return json.dumps(self.template_data, sort_keys=True)
+
+    def render(self, template_name: str, **data) -> str:
+        with tracing.span("render", template=template_name):
+            return _jinja_env().get_template(template_name).render(**(data or self.template_data))
+
+
+def render_font_page(template_name: str, font: Font) -> str:
+    """
+    Renders a page describing a single font, e.g. for each font of a sweep. The
+    template is compiled once, so each page only costs its own data and rendering.
+    """
+    with tracing.span("render", template=template_name, font=font.name):
+        return _jinja_env().get_template(template_name).render(**prepare_template_data([font]))
+
+
+def write_font_html(context: BuildContext):
     out_path = "dist/index.html"
-    data = prepare_template_data(fonts)
-    html = _jinja_env().get_template('index.html.jinja').render(**data)
+    html = context.render('index.html.jinja')
     with open(out_path, 'w') as f:
         f.write(html)
-    print(f"Wrote HTML at {out_path}")
+    tracing.event("output.written", f"Wrote HTML at {out_path}", path=out_path)
 
 
-def write_font_readme(fonts: List[Font]):
+def write_font_readme(context: BuildContext):
     out_path = "dist/README.md"
-    data = prepare_template_data(fonts)
-    md = _jinja_env().get_template('README.md.jinja').render(**data)
+    md = context.render('README.md.jinja')
     with open(out_path, 'w') as f:
         f.write(md)
-    print(f"Wrote README at {out_path}")
+    tracing.event("output.written", f"Wrote README at {out_path}", path=out_path)
 
 
-def write_font_license():
+def write_font_license(context: BuildContext):
     out_path = "dist/LICENSE.md"
-    md = _jinja_env().get_template('LICENSE.md.jinja').render(author=AUTHOR)
+    md = context.render('LICENSE.md.jinja', author=AUTHOR)
     with open(out_path, 'w') as f:
         f.write(md)
-    print(f"Wrote OFL 1.1 license at {out_path}")
+    tracing.event("output.written", f"Wrote OFL 1.1 license at {out_path}", path=out_path)
+
 
 def dashing(value: str):
     return re.sub(r'(?<!^)(?=[A-Z])', '-', value).lower()
 
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,355 @@
+import json
+import os
+import struct
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+if TYPE_CHECKING:
+    from model import Font
+
+# Metrics are read by test harnesses that should not need fontTools, so this
+# module only uses the standard library, and takes fonts by their attributes.
+
+MAGIC = b"BDMT"
+VERSION = 1
+
+# Fixed-layout records, all little-endian, in this order after the header. Strings
+# are indices into the string table, or NO_STRING. Records refer to the records of
+# later sections by (first index, count).
+# magic, version, reserved, and the number of records in each following section
+HEADER = struct.Struct("<4sHHIIIIIII")
+FONT_RECORD = struct.Struct("<IiiiIIIIII")  # name, em size, ascent, descent, baselines, glyphs, masters
+BASELINE_RECORD = struct.Struct("<IidIIIBBxx")  # id, position, normalized, table, name, label, style, stroke width
+GLYPH_RECORD = struct.Struct("<IIIIII")  # code point, kind, two baseline ids, ranges
+RANGE_RECORD = struct.Struct("<II")  # first and last code point
+MASTER_RECORD = struct.Struct("<IdI")  # name, location, positions (one per font baseline)
+POSITION_RECORD = struct.Struct("<id")  # position, normalized
+STRING_RECORD = struct.Struct("<II")  # offset into the string data, length in bytes
+
+NO_STRING = 0xFFFFFFFF
+STYLES = [None, "solid", "dashed"]
+GLYPH_KINDS = ["EMBOX_FILLED", "EMBOX_OUTLINE", "PAIR_LAYOUT", "PAIR_LABELED"]
+
+
+@dataclass
+class BaselineMetric:
+    id: str
+    position: int
+    # Distance from the top of the em-box, as a fraction of the em height, like the
+    # stylesheet variables: 0 for the ascent and 1 for the descent
+    normalized: float
+    table: Optional[str]
+    name: Optional[str]
+    label: Optional[str]
+    style: Optional[str]
+    stroke_width: int
+
+
+@dataclass
+class GlyphMetric:
+    codepoint: int
+    kind: str
+    baselines: List[str]
+    ranges: List[List[int]] = field(default_factory=list)
+
+
+@dataclass
+class MasterMetric:
+    name: str
+    location: float
+    # Positions of the font's baselines at this master, in the same order
+    positions: List[int]
+    normalized: List[float]
+
+
+@dataclass
+class FontMetrics:
+    name: str
+    em_size: int
+    ascent: int
+    descent: int
+    baselines: List[BaselineMetric]
+    glyphs: List[GlyphMetric]
+    masters: List[MasterMetric] = field(default_factory=list)
+
+
+def _extent(baselines) -> Tuple[int, int]:
+    ascent = next(baseline.position for baseline in baselines if baseline.id == "ascent")
+    descent = next(baseline.position for baseline in baselines if baseline.id == "descent")
+    return ascent, descent
+
+
+def font_metrics(font: "Font") -> FontMetrics:
+    """Returns the baseline positions and glyphs of a font spec."""
+    ascent, descent = _extent(font.baselines)
+    em_size = ascent - descent
+
+    def normalized(position: int) -> float:
+        return (ascent - position) / em_size
+
+    return FontMetrics(
+        name=font.name,
+        em_size=em_size,
+        ascent=ascent,
+        descent=descent,
+        baselines=[
+            BaselineMetric(
+                id=baseline.id,
+                position=baseline.position,
+                normalized=normalized(baseline.position),
+                table=baseline.table,
+                name=baseline.name,
+                label=baseline.label,
+                style=baseline.style.stroke_style if baseline.style else None,
+                stroke_width=baseline.style.stroke_width if baseline.style else 0,
+            )
+            for baseline in font.baselines
+        ],
+        glyphs=[
+            GlyphMetric(
+                codepoint=ord(glyph.char),
+                kind=glyph.kind.name,
+                baselines=list(glyph.baseline_ids or []),
+                ranges=[[first, last] for first, last in glyph.ranges],
+            )
+            for glyph in font.glyphs
+        ],
+        masters=[
+            MasterMetric(
+                name=master.name,
+                location=float(master.location),
+                positions=[baseline.position for baseline in master.baselines],
+                normalized=[normalized(baseline.position) for baseline in master.baselines],
+            )
+            for master in font.masters
+        ],
+    )
+
+
+class MetricsPacker:
+    """
+    Encodes the metrics of fonts in the fixed-layout binary form, see `MetricsIndex`,
+    one font at a time. Only the packed records are kept, so fonts can be added
+    from a stream without holding on to their metrics.
+    """
+
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.font_records: List[bytes] = []
+        self.baseline_records: List[bytes] = []
+        self.glyph_records: List[bytes] = []
+        self.range_records: List[bytes] = []
+        self.master_records: List[bytes] = []
+        self.position_records: List[bytes] = []
+
+    def _string(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        return self.strings.setdefault(value, len(self.strings))
+
+    def add(self, font: FontMetrics):
+        string = self._string
+        self.font_records.append(FONT_RECORD.pack(
+            string(font.name), font.em_size, font.ascent, font.descent,
+            len(self.baseline_records), len(font.baselines),
+            len(self.glyph_records), len(font.glyphs),
+            len(self.master_records), len(font.masters),
+        ))
+        for baseline in font.baselines:
+            self.baseline_records.append(BASELINE_RECORD.pack(
+                string(baseline.id), baseline.position, baseline.normalized,
+                string(baseline.table), string(baseline.name), string(baseline.label),
+                STYLES.index(baseline.style), baseline.stroke_width,
+            ))
+        for glyph in font.glyphs:
+            if len(glyph.baselines) > 2:
+                raise ValueError(f"Glyph U+{glyph.codepoint:04X} of {font.name} has more than two baselines")
+            ids = [string(baseline_id) for baseline_id in glyph.baselines]
+            ids += [NO_STRING] * (2 - len(ids))
+            self.glyph_records.append(GLYPH_RECORD.pack(
+                glyph.codepoint, GLYPH_KINDS.index(glyph.kind), *ids, len(self.range_records), len(glyph.ranges),
+            ))
+            self.range_records.extend(RANGE_RECORD.pack(first, last) for first, last in glyph.ranges)
+        for master in font.masters:
+            self.master_records.append(
+                MASTER_RECORD.pack(string(master.name), master.location, len(self.position_records))
+            )
+            self.position_records.extend(
+                POSITION_RECORD.pack(position, normalized)
+                for position, normalized in zip(master.positions, master.normalized)
+            )
+
+    def pack(self) -> bytes:
+        string_data = bytearray()
+        string_records = []
+        for value in self.strings:
+            encoded = value.encode("utf-8")
+            string_records.append(STRING_RECORD.pack(len(string_data), len(encoded)))
+            string_data += encoded
+
+        header = HEADER.pack(
+            MAGIC, VERSION, 0, len(self.font_records), len(self.baseline_records), len(self.glyph_records),
+            len(self.range_records), len(self.master_records), len(self.position_records), len(string_records),
+        )
+        return b"".join([
+            header, *self.font_records, *self.baseline_records, *self.glyph_records, *self.range_records,
+            *self.master_records, *self.position_records, *string_records, bytes(string_data),
+        ])
+
+
+def pack_metrics(fonts: Iterable[FontMetrics]) -> bytes:
+    """Encodes the metrics of any number of fonts in the fixed-layout binary form, see `MetricsIndex`."""
+    packer = MetricsPacker()
+    for font in fonts:
+        packer.add(font)
+    return packer.pack()
+
+
+class MetricsWriter:
+    """
+    Writes the metrics of fonts one at a time, as a JSON list to `json_file` and
+    into a `MetricsPacker`, whose binary form `finish` returns.
+    """
+
+    def __init__(self, json_file: TextIO):
+        self.json_file = json_file
+        self.packer = MetricsPacker()
+        self.count = 0
+
+    def add(self, font: FontMetrics):
+        self.json_file.write("," if self.count else "[")
+        self.json_file.write(json.dumps(asdict(font), separators=(",", ":")))
+        self.packer.add(font)
+        self.count += 1
+
+    def finish(self) -> bytes:
+        self.json_file.write("]\n" if self.count else "[]\n")
+        return self.packer.pack()
+
+
+class MetricsIndex(Sequence[FontMetrics]):
+    """
+    The fonts of a binary metrics file. Opening one only reads the header, and each
+    font is decoded from its fixed-size records when it is accessed, so a file of
+    thousands of fonts can be opened and looked up in without decoding the rest.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        magic, version, _, *counts = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"Not a metrics file (starts with {bytes(magic)!r})")
+        if version != VERSION:
+            raise ValueError(f"Unsupported metrics version {version}, expected {VERSION}")
+
+        # Offsets of each section, which follow each other in record order
+        self.offsets = []
+        offset = HEADER.size
+        records = [FONT_RECORD, BASELINE_RECORD, GLYPH_RECORD, RANGE_RECORD, MASTER_RECORD, POSITION_RECORD,
+                   STRING_RECORD]
+        for record, count in zip(records, counts):
+            self.offsets.append(offset)
+            offset += record.size * count
+        self.string_data_offset = offset
+        self.font_count = counts[0]
+        self._names: Optional[Dict[str, int]] = None
+
+    def _records(self, section: int, record: struct.Struct, first: int, count: int) -> list:
+        start = self.offsets[section] + record.size * first
+        return list(record.iter_unpack(self.data[start:start + record.size * count]))
+
+    def _string(self, index: int) -> Optional[str]:
+        if index == NO_STRING:
+            return None
+        start, length = STRING_RECORD.unpack_from(self.data, self.offsets[6] + STRING_RECORD.size * index)
+        start += self.string_data_offset
+        return str(self.data[start:start + length], "utf-8")
+
+    def __len__(self) -> int:
+        return self.font_count
+
+    def __getitem__(self, index: int) -> FontMetrics:
+        if not -self.font_count <= index < self.font_count:
+            raise IndexError(f"Font index {index} out of range")
+        (name, em_size, ascent, descent, first_baseline, baselines, first_glyph, glyphs, first_master, masters) = (
+            FONT_RECORD.unpack_from(self.data, self.offsets[0] + FONT_RECORD.size * (index % self.font_count))
+        )
+        string = self._string
+        return FontMetrics(
+            name=string(name),
+            em_size=em_size,
+            ascent=ascent,
+            descent=descent,
+            baselines=[
+                BaselineMetric(
+                    string(baseline_id), position, normalized, string(table), string(baseline_name),
+                    string(label), STYLES[style], stroke_width,
+                )
+                for baseline_id, position, normalized, table, baseline_name, label, style, stroke_width
+                in self._records(1, BASELINE_RECORD, first_baseline, baselines)
+            ],
+            glyphs=[
+                GlyphMetric(
+                    codepoint, GLYPH_KINDS[kind],
+                    [string(baseline_id) for baseline_id in (first_id, second_id) if baseline_id != NO_STRING],
+                    [list(each) for each in self._records(3, RANGE_RECORD, first_range, ranges)],
+                )
+                for codepoint, kind, first_id, second_id, first_range, ranges
+                in self._records(2, GLYPH_RECORD, first_glyph, glyphs)
+            ],
+            masters=[
+                MasterMetric(
+                    string(master_name), location,
+                    [position for position, _ in self._records(5, POSITION_RECORD, first_position, baselines)],
+                    [normalized for _, normalized in self._records(5, POSITION_RECORD, first_position, baselines)],
+                )
+                for master_name, location, first_position in self._records(4, MASTER_RECORD, first_master, masters)
+            ],
+        )
+
+    def find(self, name: str) -> FontMetrics:
+        """Returns the metrics of the font with the given name."""
+        if self._names is None:
+            self._names = {
+                self._string(record[0]): i
+                for i, record in enumerate(self._records(0, FONT_RECORD, 0, self.font_count))
+            }
+        if name not in self._names:
+            raise KeyError(f"No metrics for font {name}")
+        return self[self._names[name]]
+
+
+def metrics_paths(out_path: str) -> List[str]:
+    """Returns the JSON and binary metrics files written next to a font."""
+    base = os.path.splitext(out_path)[0]
+    return [f"{base}.metrics.json", f"{base}.metrics.bin"]
+
+
+def write_metrics(fonts: Iterable[FontMetrics], json_path: str, bin_path: str):
+    with open(json_path, "w") as f:
+        writer = MetricsWriter(f)
+        for font in fonts:
+            writer.add(font)
+        data = writer.finish()
+    with open(bin_path, "wb") as f:
+        f.write(data)
+
+
+def load_metrics(path: str) -> Sequence[FontMetrics]:
+    """
+    Loads the metrics of every font in a JSON metrics file, or opens a binary one
+    as a `MetricsIndex`.
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            return [
+                FontMetrics(
+                    **{key: value for key, value in font.items() if key not in ("baselines", "glyphs", "masters")},
+                    baselines=[BaselineMetric(**baseline) for baseline in font["baselines"]],
+                    glyphs=[GlyphMetric(**glyph) for glyph in font["glyphs"]],
+                    masters=[MasterMetric(**master) for master in font["masters"]],
+                )
+                for font in json.load(f)
+            ]
+    with open(path, "rb") as f:
+        return MetricsIndex(f.read())
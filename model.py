@@ -0,0 +1,133 @@
+"""
+Fonts as data: the spec dataclasses, and the helpers that only need a spec. This
+module has no dependencies, so that specs can be loaded and stylesheets, metrics
+and documentation written without importing the font building stack.
+"""
+import os
+from dataclasses import dataclass, field
+from enum import auto, Enum
+from typing import List, Literal, Optional, Tuple, Union
+
+# Custom axis of variable fonts, interpolating between baseline positions
+BASELINE_AXIS_TAG = "BSLN"
+BASELINE_AXIS_NAME = "Baselines"
+
+# Web font formats written next to each TTF, in order of preference
+WEB_FONT_FLAVORS = ["woff2", "woff"]
+
+
+@dataclass(frozen=True)
+class FontBaselineStyle:
+    stroke_style: str
+    stroke_width: int
+
+
+FontBaselineStyle.SOLID = FontBaselineStyle("solid", 12)
+FontBaselineStyle.DASHED = FontBaselineStyle("dashed", 8)
+
+
+@dataclass(frozen=True)
+class FontBaseline:
+    id: str
+    position: int
+    table: Union[Literal["BASE", "OS/2", "hhea"], None]
+    name: str
+    label: str
+    style: FontBaselineStyle
+
+
+class FontGlyphKind(Enum):
+    EMBOX_FILLED = auto()
+    EMBOX_OUTLINE = auto()
+    PAIR_LAYOUT = auto()
+    PAIR_LABELED = auto()
+
+
+@dataclass
+class FontGlyph:
+    char: str
+    kind: FontGlyphKind
+    baseline_ids: Optional[List[str]] = None
+    # Further code points drawn with the same outline, as inclusive (first, last)
+    # ranges, e.g. [(0x4E00, 0x9FFF)] to cover all CJK Unified Ideographs
+    ranges: List[Tuple[int, int]] = field(default_factory=list)
+
+
+@dataclass
+class FontMaster:
+    """
+    Baseline positions at another location of a variable font's baseline axis. The
+    baselines must match the font's own baselines in everything but position.
+    """
+    name: str
+    location: float
+    baselines: List[FontBaseline]
+
+
+@dataclass
+class Font:
+    name: str
+    description: str
+    baselines: List[FontBaseline]
+    glyphs: List[FontGlyph] = field(default_factory=list)
+    # When given, the font is built as a variable font. Its own baselines are the
+    # default master, at location 0 of the baseline axis.
+    masters: List[FontMaster] = field(default_factory=list)
+
+
+@dataclass
+class FontChunk:
+    """Part of a font that is loaded on its own, holding the glyphs of the given kinds."""
+    name: str
+    kinds: List[FontGlyphKind]
+    # Whether the diagnostic "X" glyph is part of this chunk
+    diagnostic: bool = False
+
+
+# Layout and em-box glyphs are plain rectangles, while labeled glyphs carry the
+# outlines of their text labels, so pages using only the former skip the latter.
+FONT_CHUNKS = [
+    FontChunk("layout", [FontGlyphKind.EMBOX_FILLED, FontGlyphKind.EMBOX_OUTLINE, FontGlyphKind.PAIR_LAYOUT]),
+    FontChunk("labeled", [FontGlyphKind.PAIR_LABELED], diagnostic=True),
+]
+
+
+def em_size_of(font: Font) -> int:
+    ascent = next(baseline.position for baseline in font.baselines if baseline.id == 'ascent')
+    descent = next(baseline.position for baseline in font.baselines if baseline.id == 'descent')
+    return ascent - descent
+
+
+def glyph_name_for_char(char: str) -> str:
+    """Returns the name of the glyph that a font spec glyph is built as."""
+    cp = ord(char)
+    return f"uni{cp:04X}" if cp <= 0xFFFF else f"u{cp:05X}"
+
+
+def web_font_path(out_path: str, flavor: str) -> str:
+    return f"{os.path.splitext(out_path)[0]}.{flavor}"
+
+
+def chunk_codepoints(font: Font, chunk: FontChunk) -> List[int]:
+    codepoints = []
+    for glyph in font.glyphs:
+        if glyph.kind in chunk.kinds:
+            codepoints.append(ord(glyph.char))
+            for first, last in glyph.ranges:
+                codepoints.extend(range(first, last + 1))
+    if chunk.diagnostic:
+        codepoints.append(ord("X"))
+    return sorted(set(codepoints))
+
+
+def chunk_font_path(out_path: str, chunk: FontChunk, flavor: Optional[str] = None) -> str:
+    return f"{os.path.splitext(out_path)[0]}.{chunk.name}.{flavor or 'ttf'}"
+
+
+def chunk_font_paths(font: Font, out_path: str) -> List[str]:
+    """Returns the files written for each non-empty chunk of the font."""
+    return [
+        chunk_font_path(out_path, chunk, flavor)
+        for chunk in FONT_CHUNKS if chunk_codepoints(font, chunk)
+        for flavor in [None, *WEB_FONT_FLAVORS]
+    ]
@@ -0,0 +1,397 @@
+import argparse
+import glob
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fontTools.pens.basePen import BasePen
+from fontTools.ttLib import TTFont
+
+import tracing
+from model import FONT_CHUNKS
+from scheduler import PROJECT_DIR, job_count
+
+GOLDEN_DIR = os.path.join(PROJECT_DIR, "golden")
+DIFF_DIR = os.path.join(PROJECT_DIR, ".cache", "raster-diff")
+DEFAULT_SIZES = [32, 256]
+
+# Vertical samples per pixel row; horizontal coverage is computed exactly
+SUBSAMPLES = 4
+# Maximum distance in pixels between a curve and its flattened segments
+FLATNESS = 0.1
+
+tracing.quiet_font_timestamps()
+
+
+@dataclass
+class Bitmap:
+    width: int
+    height: int
+    # One byte per pixel, 0 for ink and 255 for background
+    pixels: bytes
+
+
+@dataclass
+class GlyphResult:
+    font: str
+    size: int
+    glyph: str
+    # "ok", "updated", "missing" or "differs"
+    status: str
+    message: str = ""
+
+
+class RasterPen(BasePen):
+    """Collects the outline of a glyph as line segments in pixel coordinates."""
+
+    def __init__(self, glyph_set, scale: float, top: float, component_edges: Optional[Dict[str, list]] = None):
+        super().__init__(glyph_set)
+        self.scale = scale
+        self.top = top
+        self.edges: List[Tuple[float, float, float, float]] = []
+        # Edges of component base glyphs, shared by every glyph rendered at one size
+        self.component_edges = component_edges if component_edges is not None else {}
+        self._start = (0.0, 0.0)
+        self._last = (0.0, 0.0)
+
+    def addComponent(self, glyphName, transformation):
+        # Components at their original position are flattened once and reused
+        if tuple(transformation) != (1, 0, 0, 1, 0, 0):
+            super().addComponent(glyphName, transformation)
+            return
+        if glyphName not in self.component_edges:
+            pen = RasterPen(self.glyphSet, self.scale, self.top, self.component_edges)
+            self.glyphSet[glyphName].draw(pen)
+            self.component_edges[glyphName] = pen.edges
+        self.edges.extend(self.component_edges[glyphName])
+
+    def _point(self, pt) -> Tuple[float, float]:
+        return pt[0] * self.scale, (self.top - pt[1]) * self.scale
+
+    def _add_edge(self, end: Tuple[float, float]):
+        x0, y0 = self._last
+        x1, y1 = end
+        if y0 != y1:
+            self.edges.append((x0, y0, x1, y1))
+        self._last = end
+
+    def _moveTo(self, pt):
+        self._start = self._last = self._point(pt)
+
+    def _lineTo(self, pt):
+        self._add_edge(self._point(pt))
+
+    def _qCurveToOne(self, pt1, pt2):
+        x0, y0 = self._last
+        x1, y1 = self._point(pt1)
+        x2, y2 = self._point(pt2)
+        deviation = math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2) / 4
+        steps = max(1, math.ceil(math.sqrt(deviation / FLATNESS)))
+        for i in range(1, steps + 1):
+            t = i / steps
+            u = 1 - t
+            self._add_edge((u * u * x0 + 2 * u * t * x1 + t * t * x2, u * u * y0 + 2 * u * t * y1 + t * t * y2))
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        x0, y0 = self._last
+        x1, y1 = self._point(pt1)
+        x2, y2 = self._point(pt2)
+        x3, y3 = self._point(pt3)
+        deviation = max(
+            math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2),
+            math.hypot(x1 - 2 * x2 + x3, y1 - 2 * y2 + y3),
+        ) * 3 / 4
+        steps = max(1, math.ceil(math.sqrt(deviation / FLATNESS)))
+        for i in range(1, steps + 1):
+            t = i / steps
+            u = 1 - t
+            self._add_edge((
+                u * u * u * x0 + 3 * u * u * t * x1 + 3 * u * t * t * x2 + t * t * t * x3,
+                u * u * u * y0 + 3 * u * u * t * y1 + 3 * u * t * t * y2 + t * t * t * y3,
+            ))
+
+    def _closePath(self):
+        self._add_edge(self._start)
+
+    def _endPath(self):
+        # Open contours are filled as if closed
+        self._add_edge(self._start)
+
+
+def fill_edges(edges: Sequence[Tuple[float, float, float, float]], width: int, height: int) -> Bitmap:
+    """
+    Fills the outline with the nonzero winding rule. Each pixel row is sampled at
+    `SUBSAMPLES` heights, and the coverage of each sample span is split exactly
+    across the pixels it touches.
+    """
+    rows = height * SUBSAMPLES
+    crossings: List[List[Tuple[float, int]]] = [[] for _ in range(rows)]
+    for x0, y0, x1, y1 in edges:
+        direction = 1 if y1 > y0 else -1
+        if y0 > y1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        first = max(0, math.ceil(y0 * SUBSAMPLES - 0.5))
+        last = min(rows, math.ceil(y1 * SUBSAMPLES - 0.5))
+        slope = (x1 - x0) / (y1 - y0)
+        for row in range(first, last):
+            crossings[row].append((x0 + ((row + 0.5) / SUBSAMPLES - y0) * slope, direction))
+
+    weight = 1 / SUBSAMPLES
+    pixels = bytearray(b"\xff" * (width * height))
+    for y in range(height):
+        coverage = [0.0] * (width + 1)
+        # Full pixels are added as a difference array and summed once per row
+        runs = [0.0] * (width + 1)
+        for row in crossings[y * SUBSAMPLES:(y + 1) * SUBSAMPLES]:
+            row.sort()
+            winding = 0
+            start = 0.0
+            for x, direction in row:
+                if winding == 0:
+                    start = x
+                winding += direction
+                if winding == 0:
+                    left = min(max(start, 0.0), width)
+                    right = min(max(x, 0.0), width)
+                    if right <= left:
+                        continue
+                    left_pixel = int(left)
+                    right_pixel = int(right)
+                    if left_pixel == right_pixel:
+                        coverage[left_pixel] += (right - left) * weight
+                    else:
+                        coverage[left_pixel] += (left_pixel + 1 - left) * weight
+                        runs[left_pixel + 1] += weight
+                        runs[right_pixel] -= weight
+                        coverage[right_pixel] += (right - right_pixel) * weight
+
+        offset = y * width
+        run = 0.0
+        for x in range(width):
+            run += runs[x]
+            ink = run + coverage[x]
+            if ink > 0.002:
+                pixels[offset + x] = 255 - min(255, round(ink * 255))
+    return Bitmap(width, height, bytes(pixels))
+
+
+def render_glyphs(ttfont: TTFont, glyph_names: Sequence[str], size: int) -> Dict[str, Bitmap]:
+    """
+    Renders glyphs at `size` pixels per em, each in an image spanning its advance
+    and the hhea ascent to descent.
+    """
+    scale = size / ttfont["head"].unitsPerEm
+    ascent = ttfont["hhea"].ascent
+    descent = ttfont["hhea"].descent
+    glyph_set = ttfont.getGlyphSet()
+    h_metrics = ttfont["hmtx"]
+    component_edges: Dict[str, list] = {}
+
+    bitmaps = {}
+    for glyph_name in glyph_names:
+        pen = RasterPen(glyph_set, scale, ascent, component_edges)
+        glyph_set[glyph_name].draw(pen)
+        width = max(1, round(h_metrics[glyph_name][0] * scale))
+        height = max(1, round((ascent - descent) * scale))
+        bitmaps[glyph_name] = fill_edges(pen.edges, width, height)
+    return bitmaps
+
+
+def rendered_glyphs(ttfont: TTFont) -> List[str]:
+    """Returns the glyphs that text can show: .notdef and every glyph in the character map."""
+    return [".notdef", *sorted(set(ttfont.getBestCmap().values()), key=ttfont.getGlyphID)]
+
+
+def write_png(path: str, bitmap: Bitmap, channels: int = 1):
+    """Writes 8-bit grayscale (or RGB, with 3 channels) pixels as a PNG file."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    stride = bitmap.width * channels
+    raw = b"".join(b"\x00" + bitmap.pixels[y * stride:(y + 1) * stride] for y in range(bitmap.height))
+    color_type = 0 if channels == 1 else 2
+    header = struct.pack(">IIBBBBB", bitmap.width, bitmap.height, 8, color_type, 0, 0, 0)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b""))
+
+
+def read_png(path: str) -> Bitmap:
+    """Reads a grayscale PNG as written by `write_png`."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError(f"{path} is not a PNG file")
+
+    offset = 8
+    header = None
+    compressed = b""
+    while offset < len(data):
+        (length,) = struct.unpack(">I", data[offset:offset + 4])
+        tag = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        if tag == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif tag == b"IDAT":
+            compressed += body
+        offset += length + 12
+
+    if header is None or header[2:] != (8, 0, 0, 0, 0):
+        raise ValueError(f"{path} is not an 8-bit grayscale PNG")
+    width, height = header[:2]
+    raw = zlib.decompress(compressed)
+    rows = []
+    for y in range(height):
+        start = y * (width + 1)
+        if raw[start] != 0:
+            raise ValueError(f"{path} uses PNG row filters, which are not supported")
+        rows.append(raw[start + 1:start + 1 + width])
+    return Bitmap(width, height, b"".join(rows))
+
+
+def count_differences(expected: Bitmap, actual: Bitmap, pixel_threshold: int) -> int:
+    """Returns the number of pixels that differ by more than `pixel_threshold`."""
+    if expected.pixels == actual.pixels:
+        return 0
+    return sum(1 for a, b in zip(expected.pixels, actual.pixels) if abs(a - b) > pixel_threshold)
+
+
+def diff_bitmap(expected: Bitmap, actual: Bitmap, pixel_threshold: int) -> Bitmap:
+    """Returns an RGB image of the expected glyph, with extra ink in red and missing ink in blue."""
+    pixels = bytearray()
+    for a, b in zip(expected.pixels, actual.pixels):
+        faded = 255 - (255 - a) // 4
+        if abs(a - b) <= pixel_threshold:
+            pixels += bytes((faded, faded, faded))
+        else:
+            pixels += b"\xff\x00\x00" if b < a else b"\x00\x00\xff"
+    return Bitmap(expected.width, expected.height, bytes(pixels))
+
+
+def glyph_file_name(glyph_name: str) -> str:
+    return f"{glyph_name.lstrip('.') or glyph_name}.png"
+
+
+def check_font(
+    path: str,
+    size: int,
+    golden_dir: str,
+    diff_dir: str,
+    update: bool = False,
+    pixel_threshold: int = 16,
+    max_diff: float = 0.001,
+) -> List[GlyphResult]:
+    """
+    Renders every glyph of the font at `size` and compares it against the golden
+    image in `golden_dir/FONT/SIZE`. With `update`, the golden images are rewritten
+    instead. Diff images of failed glyphs are written to `diff_dir/FONT/SIZE`.
+    """
+    font_name = os.path.splitext(os.path.basename(path))[0]
+    golden_path = os.path.join(golden_dir, font_name, str(size))
+    with TTFont(path) as ttfont:
+        bitmaps = render_glyphs(ttfont, rendered_glyphs(ttfont), size)
+    results = []
+    for glyph_name, bitmap in bitmaps.items():
+        image_path = os.path.join(golden_path, glyph_file_name(glyph_name))
+        if update:
+            write_png(image_path, bitmap)
+            results.append(GlyphResult(font_name, size, glyph_name, "updated"))
+            continue
+        if not os.path.exists(image_path):
+            results.append(GlyphResult(font_name, size, glyph_name, "missing", f"No golden image at {image_path}"))
+            continue
+
+        expected = read_png(image_path)
+        if (expected.width, expected.height) != (bitmap.width, bitmap.height):
+            message = f"Size is {bitmap.width}x{bitmap.height}, expected {expected.width}x{expected.height}"
+            results.append(GlyphResult(font_name, size, glyph_name, "differs", message))
+            continue
+
+        count = count_differences(expected, bitmap, pixel_threshold)
+        if count > max_diff * bitmap.width * bitmap.height:
+            diff_path = os.path.join(diff_dir, font_name, str(size), glyph_file_name(glyph_name))
+            write_png(diff_path, diff_bitmap(expected, bitmap, pixel_threshold), channels=3)
+            message = f"{count} pixels differ, diff at {diff_path}"
+            results.append(GlyphResult(font_name, size, glyph_name, "differs", message))
+        else:
+            results.append(GlyphResult(font_name, size, glyph_name, "ok"))
+    return results
+
+
+def _check_task(args: tuple) -> List[GlyphResult]:
+    return check_font(*args)
+
+
+def font_paths(paths: Sequence[str]) -> List[str]:
+    """
+    Expands directories, e.g. `dist` or a sweep output, into the TTF files they
+    contain. Chunks of split fonts are left out, as their whole fonts are checked.
+    """
+    chunk_suffixes = tuple(f".{chunk.name}.ttf" for chunk in FONT_CHUNKS)
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(sorted(
+                each for each in glob.glob(os.path.join(path, "*.ttf")) if not each.endswith(chunk_suffixes)
+            ))
+        else:
+            result.append(path)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Renders the glyphs of built fonts and compares them to golden images.")
+    parser.add_argument("paths", nargs="*", default=["dist"], help="fonts, or directories of fonts (default: dist)")
+    parser.add_argument("--size", type=int, action="append",
+                        help=f"pixels per em to render at; repeatable (default: {', '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--golden", default=GOLDEN_DIR, help="directory of golden images (default: %(default)s)")
+    parser.add_argument("--diff-dir", default=DIFF_DIR, help="directory for diff images (default: %(default)s)")
+    parser.add_argument("--update", action="store_true", help="rewrite the golden images instead of comparing")
+    parser.add_argument("--pixel-threshold", type=int, default=16,
+                        help="difference out of 255 above which a pixel counts as changed (default: %(default)s)")
+    parser.add_argument("--max-diff", type=float, default=0.001,
+                        help="fraction of changed pixels allowed per glyph (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=job_count, default=None,
+                        help="number of render processes to use (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    paths = font_paths(args.paths)
+    sizes = args.size or DEFAULT_SIZES
+    jobs = args.jobs or os.cpu_count() or 1
+    tasks = [
+        (path, size, args.golden, args.diff_dir, args.update, args.pixel_threshold, args.max_diff)
+        for path in paths for size in sizes
+    ]
+
+    counts: Dict[str, int] = {}
+
+    def report(batches: Iterable[List[GlyphResult]]):
+        for batch in batches:
+            for result in batch:
+                counts[result.status] = counts.get(result.status, 0) + 1
+                if result.status in ("missing", "differs"):
+                    print(f"{result.font} {result.glyph} at {result.size}px: {result.message}")
+
+    start = time.perf_counter()
+    if jobs == 1:
+        report(map(_check_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            report(executor.map(_check_task, tasks))
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts.values())
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"Rendered {total} glyphs of {len(paths)} fonts in {elapsed:.2f}s ({summary})", file=sys.stderr)
+    if counts.get("missing") or counts.get("differs"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import tracing
+
+MANIFEST_VERSION = 1
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class BuildTarget:
+    name: str
+    action: Callable
+    args: tuple = ()
+    deps: List[str] = field(default_factory=list)
+    # Files written by the target, and a hash of everything they are built from.
+    # Targets with an input hash are skipped when it matches the build manifest.
+    outputs: List[str] = field(default_factory=list)
+    input_hash: Optional[str] = None
+
+
+@dataclass
+class BuildResult:
+    name: str
+    output: str
+    value: Any
+    skipped: bool = False
+
+
+def content_hash(*parts: Union[str, bytes]) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        # Length-prefix each part so that ("ab", "c") and ("a", "bc") differ
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return content_hash(f.read())
+
+
+def _project_modules(module: ModuleType, found: Dict[str, ModuleType]):
+    found[module.__name__] = module
+    for value in list(vars(module).values()):
+        name = value.__name__ if isinstance(value, ModuleType) else getattr(value, "__module__", None)
+        other = sys.modules.get(name) if isinstance(name, str) else None
+        path = getattr(other, "__file__", None)
+        if other is not None and name not in found and path and os.path.dirname(os.path.abspath(path)) == PROJECT_DIR:
+            _project_modules(other, found)
+
+
+def module_hash(*modules: ModuleType) -> str:
+    """
+    Returns a hash of the source files of the modules, and of every module of this
+    project that they use, directly or through each other.
+    """
+    found: Dict[str, ModuleType] = {}
+    for module in modules:
+        _project_modules(module, found)
+    paths = sorted(set(os.path.abspath(module.__file__) for module in found.values()))
+    return content_hash(*(content_hash(os.path.basename(path), file_hash(path)) for path in paths))
+
+
+def job_count(value: str) -> int:
+    """Parses a `--jobs` argument, which must be at least 1."""
+    try:
+        jobs = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number, got {value!r}") from None
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {jobs}")
+    return jobs
+
+
+def load_manifest(path: str) -> Dict[str, dict]:
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("targets", {})
+
+
+def save_manifest(path: str, entries: Dict[str, dict]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "targets": entries}, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def _run_target(name: str, action: Callable, args: tuple, collect_events=False):
+    # Output is captured so that it can be replayed in target order, regardless of
+    # which worker finished first.
+    if collect_events:
+        tracing.enable()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), tracing.span("target", target=name):
+        value = action(*args)
+    # Trace events recorded in a worker process are sent back with the result
+    events = tracing.take_events() if collect_events else []
+    return output.getvalue(), value, events
+
+
+def _check_graph(targets: List[BuildTarget]):
+    names = set()
+    for target in targets:
+        if target.name in names:
+            raise ValueError(f"Duplicate build target {target.name}")
+        names.add(target.name)
+
+    for target in targets:
+        for dep in target.deps:
+            if dep not in names:
+                raise ValueError(f"Build target {target.name} depends on unknown target {dep}")
+
+    visiting = set()
+    visited = set()
+    by_name = {target.name: target for target in targets}
+
+    def visit(name):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Build targets have a dependency cycle through {name}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        visiting.remove(name)
+        visited.add(name)
+
+    for target in targets:
+        visit(target.name)
+
+
+def _effective_hashes(targets: List[BuildTarget]) -> Dict[str, Optional[str]]:
+    # A target's hash also covers the hashes of its dependencies, so that it is
+    # rebuilt whenever anything upstream of it changes.
+    by_name = {target.name: target for target in targets}
+    hashes: Dict[str, Optional[str]] = {}
+
+    def effective(name):
+        if name not in hashes:
+            target = by_name[name]
+            dep_hashes = [effective(dep) for dep in target.deps]
+            if target.input_hash is None or None in dep_hashes:
+                hashes[name] = None
+            else:
+                hashes[name] = content_hash(target.input_hash, *dep_hashes)
+        return hashes[name]
+
+    for target in targets:
+        effective(target.name)
+    return hashes
+
+
+def run_build(
+    targets: List[BuildTarget],
+    jobs: Optional[int] = None,
+    manifest_path: Optional[str] = None,
+    force: bool = False,
+    report_skipped: bool = True,
+) -> List[BuildResult]:
+    """
+    Runs the build targets on a process pool of `jobs` workers (defaulting to the
+    CPU count), starting each target once all of its dependencies have finished.
+
+    Output printed by each target is written out in the order the targets were
+    given, and results are returned in that same order.
+
+    When a `manifest_path` is given, targets whose input hash and outputs match the
+    manifest are skipped unless `force` is set, and the manifest is updated with
+    the targets that were built. Skipped targets print an "Up to date" line unless
+    `report_skipped` is unset.
+    """
+    _check_graph(targets)
+    if jobs is not None and jobs < 1:
+        raise ValueError(f"Builds need at least one job, got {jobs}")
+    jobs = jobs or os.cpu_count() or 1
+
+    hashes = _effective_hashes(targets)
+    manifest = load_manifest(manifest_path) if manifest_path else {}
+
+    results: List[Optional[BuildResult]] = [None] * len(targets)
+    done = set()
+    next_to_print = 0
+
+    def is_up_to_date(target: BuildTarget) -> bool:
+        entry = manifest.get(target.name)
+        return (
+            not force
+            and hashes[target.name] is not None
+            and entry is not None
+            and entry.get("inputs") == hashes[target.name]
+            and entry.get("outputs") == target.outputs
+            and all(os.path.exists(path) for path in target.outputs)
+        )
+
+    def finish(i: int, output: str, value: Any, skipped: bool = False):
+        nonlocal next_to_print
+        target = targets[i]
+        results[i] = BuildResult(target.name, output, value, skipped)
+        done.add(target.name)
+        if not skipped and hashes[target.name] is not None:
+            manifest[target.name] = {"inputs": hashes[target.name], "outputs": target.outputs}
+        while next_to_print < len(targets) and results[next_to_print] is not None:
+            print(results[next_to_print].output, end="")
+            next_to_print += 1
+
+    def skip_up_to_date(pending: List[int]):
+        for i in list(pending):
+            if is_up_to_date(targets[i]):
+                pending.remove(i)
+                output = f"Up to date: {', '.join(targets[i].outputs)}\n" if report_skipped else ""
+                finish(i, output, None, skipped=True)
+
+    pending = list(range(len(targets)))
+    try:
+        skip_up_to_date(pending)
+
+        if jobs == 1 or not pending:
+            while pending:
+                i = next(i for i in pending if all(dep in done for dep in targets[i].deps))
+                pending.remove(i)
+                output, value, _ = _run_target(targets[i].name, targets[i].action, targets[i].args)
+                finish(i, output, value)
+            return results
+
+        # Worker processes cost a noticeable share of startup to even import
+        from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            running: Dict[Future, int] = {}
+
+            def submit_ready():
+                for i in list(pending):
+                    if all(dep in done for dep in targets[i].deps):
+                        pending.remove(i)
+                        future = executor.submit(
+                            _run_target, targets[i].name, targets[i].action, targets[i].args, tracing.is_enabled()
+                        )
+                        running[future] = i
+
+            submit_ready()
+            while running:
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    i = running.pop(future)
+                    try:
+                        output, value, events = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    tracing.add_events(events)
+                    finish(i, output, value)
+                submit_ready()
+
+        return results
+    finally:
+        if manifest_path:
+            save_manifest(manifest_path, manifest)
@@ -0,0 +1,157 @@
+import argparse
+import dataclasses
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from font import Font, build_baselines_font_bytes
+from sweep import make_variant
+
+CONTENT_TYPES = {
+    "ttf": "font/ttf",
+    "woff": "font/woff",
+    "woff2": "font/woff2",
+}
+
+
+class ByteLRUCache:
+    """Thread-safe LRU cache whose size is bounded by the total length of its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().removesuffix("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def font_for_query(bases: Dict[str, Font], query: Dict[str, List[str]]) -> Font:
+    """
+    Builds the font spec for a request. Query parameters are `base` (font name),
+    `em` (em size), `glyphs` (characters to include) and baseline ids mapped to
+    positions, e.g. `?em=2000&alphabetic=0&glyphs=xχ`.
+    """
+    params = {key: values[-1] for key, values in query.items()}
+    base_name = params.pop("base", next(iter(bases)))
+    if base_name not in bases:
+        raise ValueError(f"Unknown base font {base_name}")
+    base = bases[base_name]
+
+    em_size = int(params.pop("em")) if "em" in params else None
+    glyph_chars = params.pop("glyphs", None)
+    positions = {baseline_id: int(value) for baseline_id, value in params.items()}
+
+    font = make_variant(base, base.name, em_size, positions)
+    if glyph_chars is not None:
+        glyphs_by_char = {glyph.char: glyph for glyph in base.glyphs}
+        for char in glyph_chars:
+            if char not in glyphs_by_char:
+                raise ValueError(f"Font {base.name} has no glyph {char}")
+        font = dataclasses.replace(font, glyphs=[glyphs_by_char[char] for char in dict.fromkeys(glyph_chars)])
+    return font
+
+
+class FontService:
+    def __init__(self, bases: Dict[str, Font], cache_bytes: int):
+        self.bases = bases
+        self.cache = ByteLRUCache(cache_bytes)
+        # The label font and its outline cache are shared, and not safe to use
+        # from several threads at once
+        self._build_lock = threading.Lock()
+
+    def get_font(self, flavor: str, query: Dict[str, List[str]]) -> Tuple[bytes, bool]:
+        """Returns the font for a request, and whether it came from the cache."""
+        font = font_for_query(self.bases, query)
+        key = hashlib.sha256(f"{flavor}:{font!r}".encode("utf-8")).hexdigest()
+        data = self.cache.get(key)
+        if data is not None:
+            return data, True
+        with self._build_lock:
+            data = build_baselines_font_bytes(font, None if flavor == "ttf" else flavor)
+        self.cache.put(key, data)
+        return data, False
+
+
+def make_handler(service: FontService):
+    class FontRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            name, _, extension = url.path.rpartition(".")
+            if name != "/font" or extension not in CONTENT_TYPES:
+                self.send_error(404, "Expected /font.ttf, /font.woff or /font.woff2")
+                return
+
+            start = time.perf_counter()
+            try:
+                data, cached = service.get_font(extension, parse_qs(url.query))
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            elapsed = time.perf_counter() - start
+
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPES[extension])
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            self.send_header("Server-Timing", f"build;dur={elapsed * 1000:.1f};desc=\"{'cached' if cached else 'built'}\"")
+            self.end_headers()
+            self.wfile.write(data)
+
+    return FontRequestHandler
+
+
+def main(argv=None):
+    from main import default_fonts
+
+    parser = argparse.ArgumentParser(description="Serves baseline diagnostic fonts built on demand.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=parse_size, default=parse_size("64M"),
+                        help="maximum total size of cached fonts, e.g. 64M (default: 64M)")
+    args = parser.parse_args(argv)
+
+    service = FontService({font.name: font for font in default_fonts()}, args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving fonts at http://{args.host}:{args.port}/font.ttf")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
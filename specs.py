@@ -0,0 +1,243 @@
+import glob
+import json
+import os
+import tomllib
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from model import Font, FontBaseline, FontBaselineStyle, FontGlyph, FontGlyphKind, FontMaster
+
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+SPEC_EXTENSIONS = (".toml", ".json")
+
+BASELINE_TABLES = ["BASE", "OS/2", "hhea", "vhea"]
+BASELINE_STYLES = {"SOLID": FontBaselineStyle.SOLID, "DASHED": FontBaselineStyle.DASHED}
+
+# Keys of each kind of object, as (type, whether required)
+FONT_SCHEMA = {
+    "name": (str, True),
+    "description": (str, True),
+    "base": (str, False),
+    "baselines": (list, False),
+    "glyphs": (list, False),
+    "masters": (list, False),
+}
+BASELINE_SCHEMA = {
+    "id": (str, True),
+    "position": (int, True),
+    "table": (str, False),
+    "name": (str, False),
+    "label": (str, False),
+    "style": (str, False),
+}
+GLYPH_SCHEMA = {
+    "char": (str, True),
+    "kind": (str, True),
+    "baselines": (list, False),
+    "ranges": (list, False),
+}
+MASTER_SCHEMA = {
+    "name": (str, True),
+    "location": ((int, float), True),
+    "positions": (dict, True),
+}
+
+
+class SpecError(ValueError):
+    """A font spec file that cannot be parsed, or does not match the schema."""
+
+    def __init__(self, path: str, key: str, message: str):
+        self.path = path
+        self.key = key
+        super().__init__(f"{path}: {key + ': ' if key else ''}{message}")
+
+
+def _check_object(path: str, key: str, value: Any, schema: Dict[str, Tuple[Any, bool]]) -> dict:
+    if not isinstance(value, dict):
+        raise SpecError(path, key, "expected a table")
+    for field_name in value:
+        if field_name not in schema:
+            raise SpecError(path, key, f"unknown key {field_name!r}, expected one of {', '.join(schema)}")
+    for field_name, (field_type, required) in schema.items():
+        field_key = f"{key}.{field_name}" if key else field_name
+        if field_name not in value or value[field_name] is None:
+            if required:
+                raise SpecError(path, field_key, "is required")
+            continue
+        # bool is a subclass of int, but never a valid position or location
+        if isinstance(value[field_name], bool) or not isinstance(value[field_name], field_type):
+            type_names = field_type if isinstance(field_type, tuple) else (field_type,)
+            expected = " or ".join(each.__name__ for each in type_names)
+            raise SpecError(path, field_key, f"expected {expected}, got {type(value[field_name]).__name__}")
+    return value
+
+
+def _check_choice(path: str, key: str, value: str, choices) -> str:
+    if value not in choices:
+        raise SpecError(path, key, f"expected one of {', '.join(choices)}, got {value!r}")
+    return value
+
+
+def read_spec(path: str) -> dict:
+    """Reads a TOML or JSON font spec file, without validating it."""
+    try:
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except (tomllib.TOMLDecodeError, json.JSONDecodeError) as e:
+        raise SpecError(path, "", str(e)) from None
+
+
+def parse_baselines(path: str, key: str, values: list) -> List[FontBaseline]:
+    baselines = []
+    for i, value in enumerate(values):
+        item_key = f"{key}[{i}]"
+        _check_object(path, item_key, value, BASELINE_SCHEMA)
+        table = value.get("table")
+        if table is not None:
+            _check_choice(path, f"{item_key}.table", table, BASELINE_TABLES)
+            if value.get("name") is None:
+                raise SpecError(path, f"{item_key}.name", f"is required for baselines in the {table} table")
+        style = value.get("style")
+        if style is not None:
+            _check_choice(path, f"{item_key}.style", style, BASELINE_STYLES)
+        baselines.append(FontBaseline(
+            value["id"],
+            value["position"],
+            table,
+            value.get("name"),
+            value.get("label"),
+            BASELINE_STYLES[style] if style else None,
+        ))
+
+    ids = set(baseline.id for baseline in baselines)
+    for required_id in ("ascent", "descent"):
+        if required_id not in ids:
+            raise SpecError(path, key, f"missing the {required_id!r} baseline")
+    return baselines
+
+
+def parse_glyphs(path: str, key: str, values: list, baseline_ids: set) -> List[FontGlyph]:
+    glyphs = []
+    for i, value in enumerate(values):
+        item_key = f"{key}[{i}]"
+        _check_object(path, item_key, value, GLYPH_SCHEMA)
+        if len(value["char"]) != 1:
+            raise SpecError(path, f"{item_key}.char", f"expected a single character, got {value['char']!r}")
+        kind = FontGlyphKind[_check_choice(path, f"{item_key}.kind", value["kind"], FontGlyphKind.__members__)]
+
+        ids = value.get("baselines")
+        if kind in (FontGlyphKind.PAIR_LAYOUT, FontGlyphKind.PAIR_LABELED):
+            if ids is None or len(ids) != 2:
+                raise SpecError(path, f"{item_key}.baselines", f"expected two baseline ids for {kind.name} glyphs")
+        elif ids is not None and len(ids) > 2:
+            raise SpecError(path, f"{item_key}.baselines", f"expected at most two baseline ids, got {len(ids)}")
+        for baseline_id in ids or []:
+            if baseline_id not in baseline_ids:
+                raise SpecError(path, f"{item_key}.baselines", f"unknown baseline {baseline_id!r}")
+
+        ranges = []
+        for j, each in enumerate(value.get("ranges") or []):
+            if (
+                not isinstance(each, list) or len(each) != 2
+                or not all(isinstance(cp, int) and not isinstance(cp, bool) for cp in each)
+                or not 0 <= each[0] <= each[1] <= 0x10FFFF
+            ):
+                raise SpecError(path, f"{item_key}.ranges[{j}]", "expected [first, last] code points")
+            ranges.append((each[0], each[1]))
+
+        glyphs.append(FontGlyph(value["char"], kind, ids, ranges))
+    return glyphs
+
+
+def parse_masters(path: str, key: str, values: list, baselines: List[FontBaseline]) -> List[FontMaster]:
+    baseline_ids = set(baseline.id for baseline in baselines)
+    masters = []
+    for i, value in enumerate(values):
+        item_key = f"{key}[{i}]"
+        _check_object(path, item_key, value, MASTER_SCHEMA)
+        positions = value["positions"]
+        for baseline_id, position in positions.items():
+            if baseline_id not in baseline_ids:
+                raise SpecError(path, f"{item_key}.positions", f"unknown baseline {baseline_id!r}")
+            if isinstance(position, bool) or not isinstance(position, int):
+                raise SpecError(path, f"{item_key}.positions.{baseline_id}", "expected int")
+        masters.append(FontMaster(
+            value["name"],
+            value["location"],
+            [replace(baseline, position=positions.get(baseline.id, baseline.position)) for baseline in baselines],
+        ))
+    return masters
+
+
+def parse_font(path: str, spec: Any, fonts_by_name: Dict[str, Font]) -> Font:
+    """
+    Builds a font from a spec. Baselines and glyphs that the spec leaves out are
+    taken from its `base` font, which must be one of `fonts_by_name`.
+    """
+    _check_object(path, "", spec, FONT_SCHEMA)
+    base: Optional[Font] = None
+    if "base" in spec:
+        if spec["base"] not in fonts_by_name:
+            raise SpecError(path, "base", f"unknown font {spec['base']!r}")
+        base = fonts_by_name[spec["base"]]
+
+    if "baselines" in spec:
+        baselines = parse_baselines(path, "baselines", spec["baselines"])
+    elif base:
+        baselines = base.baselines
+    else:
+        raise SpecError(path, "baselines", "is required without a base font")
+
+    baseline_ids = set(baseline.id for baseline in baselines)
+    if "glyphs" in spec:
+        glyphs = parse_glyphs(path, "glyphs", spec["glyphs"], baseline_ids)
+    elif base:
+        glyphs = base.glyphs
+    else:
+        glyphs = []
+
+    masters = parse_masters(path, "masters", spec.get("masters", []), baselines)
+    return Font(name=spec["name"], description=spec["description"], baselines=baselines, glyphs=glyphs, masters=masters)
+
+
+def spec_paths(directory: str = FONTS_DIR) -> List[str]:
+    return sorted(
+        path for path in glob.glob(os.path.join(directory, "*"))
+        if path.endswith(SPEC_EXTENSIONS)
+    )
+
+
+def load_fonts(paths: Optional[List[str]] = None) -> List[Font]:
+    """
+    Loads and validates the font specs at the given paths (by default, every spec
+    in `fonts/`), in file name order. Specs may be based on fonts in any file.
+    """
+    paths = spec_paths() if paths is None else paths
+    specs = [(path, read_spec(path)) for path in paths]
+
+    names: Dict[str, str] = {}
+    for path, spec in specs:
+        _check_object(path, "", spec, FONT_SCHEMA)
+        if spec["name"] in names:
+            raise SpecError(path, "name", f"font {spec['name']!r} is also defined in {names[spec['name']]}")
+        names[spec["name"]] = path
+
+    # Fonts are parsed once their base font is, in as many passes as needed
+    fonts_by_name: Dict[str, Font] = {}
+    remaining = list(specs)
+    while remaining:
+        ready = [
+            (path, spec) for path, spec in remaining
+            if spec.get("base") in fonts_by_name or spec.get("base") not in names
+        ]
+        if not ready:
+            path, spec = remaining[0]
+            raise SpecError(path, "base", f"fonts {', '.join(s['name'] for _, s in remaining)} are based on each other")
+        for path, spec in ready:
+            fonts_by_name[spec["name"]] = parse_font(path, spec, fonts_by_name)
+            remaining.remove((path, spec))
+
+    return [fonts_by_name[spec["name"]] for _, spec in specs]
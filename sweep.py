@@ -0,0 +1,258 @@
+import argparse
+import contextlib
+import dataclasses
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from metrics import MetricsWriter, font_metrics
+from model import Font, FontBaseline, em_size_of
+from scheduler import job_count
+
+INDEX_NAME = "index.jsonl"
+METRICS_JSON_NAME = "metrics.json"
+METRICS_BIN_NAME = "metrics.bin"
+
+
+@dataclasses.dataclass
+class FontVariant:
+    font: Font
+    file_name: str
+    base: str
+    params: Dict[str, int]
+
+
+def parse_values(value: str) -> List[int]:
+    """
+    Parses a parameter value list, either as comma separated values (`0,25,50`) or
+    as an inclusive range with an optional step (`0:50:25`).
+    """
+    if ":" in value:
+        parts = [int(part) for part in value.split(":")]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Expected start:stop[:step] but got {value}")
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) == 3 else 1
+        if step == 0:
+            raise ValueError(f"Range step must not be zero in {value}")
+        return list(range(start, stop + (1 if step > 0 else -1), step))
+    return [int(part) for part in value.split(",")]
+
+
+def make_variant(base: Font, name: str, em_size: Optional[int] = None, positions: Optional[Dict[str, int]] = None) -> Font:
+    """
+    Returns a copy of `base` with all baseline positions scaled to the given em
+    size, and then with the given baselines (by id) moved to new positions. Variants
+    of variable fonts are static fonts of their default master.
+    """
+    positions = positions or {}
+    scale = em_size / em_size_of(base) if em_size else 1
+
+    known_ids = set(baseline.id for baseline in base.baselines)
+    for baseline_id in positions:
+        if baseline_id not in known_ids:
+            raise ValueError(f"Font {base.name} has no baseline {baseline_id}")
+
+    baselines: List[FontBaseline] = []
+    for baseline in base.baselines:
+        position = positions.get(baseline.id, round(baseline.position * scale))
+        baselines.append(dataclasses.replace(baseline, position=position))
+
+    variant = dataclasses.replace(base, name=name, baselines=baselines, masters=[])
+    if em_size_of(variant) <= 0:
+        raise ValueError(f"Font {name} has ascent below descent")
+    return variant
+
+
+def variant_from_params(base: Font, name: str, params: Dict[str, int]) -> Font:
+    """Returns the variant described by the parameters of a sweep index entry."""
+    positions = {key: value for key, value in params.items() if key != "em"}
+    return make_variant(base, name, params.get("em"), positions)
+
+
+def sweep_variants(
+    base: Font,
+    positions: Optional[Dict[str, Sequence[int]]] = None,
+    em_sizes: Optional[Sequence[int]] = None,
+) -> Iterator[FontVariant]:
+    """
+    Lazily yields a variant of `base` for every combination of the given em sizes
+    and baseline positions (by baseline id, including "ascent" and "descent").
+    """
+    positions = positions or {}
+    baseline_ids = list(positions)
+    em_values: Sequence[Optional[int]] = em_sizes or [None]
+
+    combinations = itertools.product(em_values, *(positions[baseline_id] for baseline_id in baseline_ids))
+    for index, (em_size, *values) in enumerate(combinations):
+        name = f"{base.name}Sweep{index:06d}"
+        variant_positions = dict(zip(baseline_ids, values))
+        params = dict(variant_positions)
+        if em_size is not None:
+            params = {"em": em_size, **params}
+        yield FontVariant(
+            font=variant_from_params(base, name, params),
+            file_name=f"{name}.ttf",
+            base=base.name,
+            params=params,
+        )
+
+
+def _build_variants(variants: Iterable[FontVariant], jobs: int) -> Iterator[Tuple[FontVariant, bytes]]:
+    from font import build_baselines_font_bytes
+
+    if jobs == 1:
+        for variant in variants:
+            yield variant, build_baselines_font_bytes(variant.font)
+        return
+
+    # Only a few builds per worker are in flight at once, so memory stays bounded
+    # no matter how many variants the sweep expands to.
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        in_flight = deque()
+        for variant in variants:
+            in_flight.append((variant, executor.submit(build_baselines_font_bytes, variant.font)))
+            if len(in_flight) >= jobs * 4:
+                variant, future = in_flight.popleft()
+                yield variant, future.result()
+        while in_flight:
+            variant, future = in_flight.popleft()
+            yield variant, future.result()
+
+
+def read_index(root: str) -> Iterator[dict]:
+    """Yields the index entries of a sweep directory or zip archive."""
+    if root.endswith(".zip"):
+        with zipfile.ZipFile(root) as archive:
+            lines = archive.read(INDEX_NAME).decode("utf-8").splitlines()
+    else:
+        with open(os.path.join(root, INDEX_NAME)) as f:
+            lines = f.read().splitlines()
+    for line in lines:
+        if line:
+            yield json.loads(line)
+
+
+def write_sweep(
+    variants: Iterable[FontVariant], out_path: str, jobs: Optional[int] = None, docs: bool = False,
+    metrics: bool = False,
+) -> int:
+    """
+    Builds the variants and streams them into `out_path`, which is a directory, or
+    a zip archive if it ends with ".zip". An `index.jsonl` alongside the fonts maps
+    each file to the parameters of its variant. With `docs`, a README page is also
+    written for each variant, and with `metrics`, one JSON and one binary metrics
+    file hold the metrics of every variant, which are written as each variant is
+    built rather than kept until the end. Returns the number of fonts written.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    count = 0
+    if docs:
+        from main import render_font_page
+
+    def page(variant: FontVariant) -> Tuple[str, str]:
+        return f"{os.path.splitext(variant.file_name)[0]}.md", render_font_page("README.md.jinja", variant.font)
+
+    def index_line(variant: FontVariant) -> str:
+        return json.dumps({
+            "file": variant.file_name,
+            "name": variant.font.name,
+            "base": variant.base,
+            "params": variant.params,
+        }) + "\n"
+
+    if out_path.endswith(".zip"):
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        index = io.StringIO()
+        # Only one archive member can be open for writing at a time, so the JSON
+        # metrics go to a temporary file until every font is written
+        with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as archive, \
+                (tempfile.TemporaryFile("w+", encoding="utf-8") if metrics else contextlib.nullcontext()) as metrics_file:
+            writer = MetricsWriter(metrics_file) if metrics else None
+            for variant, data in _build_variants(variants, jobs):
+                archive.writestr(variant.file_name, data)
+                if docs:
+                    archive.writestr(*page(variant))
+                if writer:
+                    writer.add(font_metrics(variant.font))
+                index.write(index_line(variant))
+                count += 1
+            archive.writestr(INDEX_NAME, index.getvalue())
+            if writer:
+                metrics_data = writer.finish()
+                metrics_file.seek(0)
+                with archive.open(METRICS_JSON_NAME, "w") as f:
+                    shutil.copyfileobj(metrics_file.buffer, f)
+                archive.writestr(METRICS_BIN_NAME, metrics_data)
+    else:
+        os.makedirs(out_path, exist_ok=True)
+        metrics_path = os.path.join(out_path, METRICS_JSON_NAME)
+        with open(os.path.join(out_path, INDEX_NAME), "w") as index, \
+                (open(metrics_path, "w") if metrics else contextlib.nullcontext()) as metrics_file:
+            writer = MetricsWriter(metrics_file) if metrics else None
+            for variant, data in _build_variants(variants, jobs):
+                with open(os.path.join(out_path, variant.file_name), "wb") as f:
+                    f.write(data)
+                if docs:
+                    page_name, text = page(variant)
+                    with open(os.path.join(out_path, page_name), "w") as f:
+                        f.write(text)
+                if writer:
+                    writer.add(font_metrics(variant.font))
+                index.write(index_line(variant))
+                count += 1
+            if writer:
+                with open(os.path.join(out_path, METRICS_BIN_NAME), "wb") as f:
+                    f.write(writer.finish())
+
+    return count
+
+
+def main(argv=None):
+    from main import default_fonts
+
+    fonts = {font.name: font for font in default_fonts()}
+
+    parser = argparse.ArgumentParser(description="Builds a sweep of baseline diagnostic font variants.")
+    parser.add_argument("out", help="output directory, or a path ending in .zip to write a zip archive")
+    parser.add_argument("--base", default=next(iter(fonts)), choices=list(fonts),
+                        help="font to base the variants on (default: %(default)s)")
+    parser.add_argument("--position", action="append", default=[], metavar="ID=VALUES",
+                        help="baseline positions to sweep, e.g. alphabetic=0:100:25 or ascent=800,900")
+    parser.add_argument("--em", metavar="VALUES",
+                        help="em sizes to sweep; baseline positions are scaled to each em size")
+    parser.add_argument("--docs", action="store_true", help="also write a README page for each variant")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"also write the metrics of every variant into {METRICS_JSON_NAME} and {METRICS_BIN_NAME}")
+    parser.add_argument("-j", "--jobs", type=job_count, default=None,
+                        help="number of build processes to use (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    positions = {}
+    for position in args.position:
+        baseline_id, sep, values = position.partition("=")
+        if not sep:
+            parser.error(f"Expected ID=VALUES but got {position}")
+        positions[baseline_id] = parse_values(values)
+    em_sizes = parse_values(args.em) if args.em else None
+
+    start = time.perf_counter()
+    count = write_sweep(
+        sweep_variants(fonts[args.base], positions, em_sizes), args.out,
+        jobs=args.jobs, docs=args.docs, metrics=args.metrics,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {count} fonts to {args.out} in {elapsed:.2f}s ({count / elapsed:.1f} fonts/s)")
+
+
+if __name__ == "__main__":
+    main()
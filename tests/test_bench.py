@@ -0,0 +1,32 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import bench
+from main import default_fonts
+
+
+class SizeReportTest(unittest.TestCase):
+    def test_reports_composite_and_flat_size_of_each_font(self):
+        fonts = default_fonts()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as out_dir:
+            os.chdir(out_dir)
+            try:
+                os.makedirs("dist")
+                with contextlib.redirect_stderr(io.StringIO()):
+                    sizes = bench.output_sizes(fonts)
+            finally:
+                os.chdir(cwd)
+
+        lines = bench.size_report(sizes)
+        self.assertEqual(len(lines), len(fonts))
+        for font, line in zip(sorted(fonts, key=lambda font: font.name), lines):
+            self.assertTrue(line.startswith(f"{font.name}.ttf: "), line)
+            self.assertLess(sizes[f"{font.name}.ttf"], sizes[f"{font.name}.flat.ttf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import io
+import unittest
+
+from font import build_baselines_ttfont
+from main import default_fonts
+
+
+def decomposed_points(ttfont) -> int:
+    glyf = ttfont["glyf"]
+    return sum(len(glyf[name].getCoordinates(glyf)[0]) for name in ttfont.getBestCmap().values())
+
+
+def font_size(ttfont) -> int:
+    out = io.BytesIO()
+    ttfont.save(out)
+    return len(out.getvalue())
+
+
+class SimplifyTest(unittest.TestCase):
+    def test_composite_build_has_fewer_points(self):
+        font = next(font for font in default_fonts() if font.name == "BaselineDiagnostic")
+        drawn = build_baselines_ttfont(font)
+        simplified = []
+        merged = build_baselines_ttfont(font, simplified=simplified)
+
+        self.assertTrue(simplified)
+        self.assertLess(decomposed_points(merged), decomposed_points(drawn))
+        self.assertLess(font_size(merged), font_size(drawn))
+
+
+if __name__ == "__main__":
+    unittest.main()
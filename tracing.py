@@ -0,0 +1,132 @@
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Shared do-nothing span, so that disabled tracing costs one check per span
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        self.args["allocated_blocks"] = sys.getallocatedblocks() - self.blocks
+        self.tracer.events.append({
+            "name": self.name,
+            "ph": "X",
+            "ts": self.start / 1000,
+            "dur": (end - self.start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.args,
+        })
+
+
+class Tracer:
+    """Records spans and events in the Chrome trace event format."""
+
+    def __init__(self):
+        self.events: List[dict] = []
+
+    def span(self, name: str, args: dict) -> Span:
+        return Span(self, name, args)
+
+    def instant(self, name: str, args: dict):
+        self.events.append({
+            "name": name,
+            "ph": "i",
+            "s": "p",
+            "ts": time.perf_counter_ns() / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable():
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, **args):
+    """
+    Returns a context manager that records how long its body takes, and the change
+    in the number of allocated memory blocks, when tracing is enabled.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, args)
+
+
+def event(name: str, message: str, **args):
+    """Prints a build message, recording it as a trace event when tracing is enabled."""
+    if _tracer is not None:
+        _tracer.instant(name, {"message": message, **args})
+    print(message)
+
+
+def quiet_font_timestamps():
+    """Silences the warning that fontTools logs on every read of a built font, whose timestamps are fixed."""
+    logging.getLogger("fontTools.ttLib.tables._h_e_a_d").setLevel(logging.ERROR)
+
+
+def take_events() -> List[dict]:
+    """Returns the events recorded so far, and clears them."""
+    if _tracer is None:
+        return []
+    events = _tracer.events
+    _tracer.events = []
+    return events
+
+
+def add_events(events: List[dict]):
+    """Adds events recorded elsewhere, e.g. in a worker process."""
+    if _tracer is not None:
+        _tracer.events.extend(events)
+
+
+def write_trace(path: str, events: List[dict]):
+    """Writes events as a JSON trace that can be opened in Perfetto or chrome://tracing."""
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def summary(events: List[dict]) -> str:
+    """Formats a table of the count and total, mean and max duration of each span."""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    blocks: Dict[str, int] = defaultdict(int)
+    for each in events:
+        if each["ph"] == "X":
+            durations[each["name"]].append(each["dur"] / 1000)
+            blocks[each["name"]] += each["args"].get("allocated_blocks", 0)
+
+    lines = [f"{'stage':<28} {'count':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'blocks':>9}"]
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        lines.append(
+            f"{name:<28} {len(values):>6} {sum(values):>10.2f} {sum(values) / len(values):>9.3f} "
+            f"{max(values):>9.3f} {blocks[name]:>9}"
+        )
+    return "\n".join(lines)
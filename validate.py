@@ -0,0 +1,269 @@
+import argparse
+import io
+import mmap
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fontTools.ttLib import TTFont
+
+import tracing
+from model import Font, em_size_of, glyph_name_for_char
+from scheduler import job_count
+from sweep import INDEX_NAME, read_index, variant_from_params
+
+# Tables whose FontBaseline.name is the name of a fontTools table attribute
+METRIC_TABLES = ["OS/2", "hhea", "vhea"]
+
+tracing.quiet_font_timestamps()
+
+
+@dataclass
+class ValidationResult:
+    path: str
+    errors: List[str]
+
+
+def _open_font(path: str, data: Optional[bytes] = None) -> Tuple[TTFont, Optional[mmap.mmap]]:
+    # Fonts are memory-mapped and loaded lazily, so that only the tables that are
+    # checked are ever read and decompiled
+    if data is not None:
+        return TTFont(io.BytesIO(data), lazy=True), None
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return TTFont(mapped, lazy=True), mapped
+
+
+def check_font(ttfont: TTFont, font: Font) -> List[str]:
+    """Returns every difference between a built font and its spec."""
+    errors = []
+    em_size = em_size_of(font)
+
+    units_per_em = ttfont["head"].unitsPerEm
+    if units_per_em != em_size:
+        errors.append(f"head.unitsPerEm is {units_per_em}, expected {em_size}")
+
+    base_coords: Dict[str, Dict[str, int]] = {}
+    if "BASE" in ttfont:
+        base_table = ttfont["BASE"].table
+        for axis_name in ("HorizAxis", "VertAxis"):
+            axis = getattr(base_table, axis_name)
+            if axis is None:
+                continue
+            tags = axis.BaseTagList.BaselineTag
+            coords = axis.BaseScriptList.BaseScriptRecord[0].BaseScript.BaseValues.BaseCoord
+            base_coords[axis_name] = {tag: coord.Coordinate for tag, coord in zip(tags, coords)}
+
+    for baseline in font.baselines:
+        if baseline.table == "BASE":
+            if not base_coords:
+                errors.append(f"BASE table is missing, expected {baseline.name} for {baseline.id}")
+            for axis_name, coords in base_coords.items():
+                actual = coords.get(baseline.name)
+                if actual != baseline.position:
+                    errors.append(
+                        f"BASE.{axis_name} {baseline.name} is {actual}, expected {baseline.position} for {baseline.id}"
+                    )
+        elif baseline.table in METRIC_TABLES:
+            if baseline.table not in ttfont:
+                errors.append(f"{baseline.table} table is missing, expected {baseline.name} for {baseline.id}")
+                continue
+            actual = getattr(ttfont[baseline.table], baseline.name, None)
+            if actual != baseline.position:
+                errors.append(f"{baseline.table}.{baseline.name} is {actual}, expected {baseline.position} for {baseline.id}")
+
+    char_map = ttfont.getBestCmap()
+    h_metrics = ttfont["hmtx"]
+    for char in ["X", *(glyph.char for glyph in font.glyphs)]:
+        cp = ord(char)
+        expected_name = "X" if char == "X" else glyph_name_for_char(char)
+        glyph_name = char_map.get(cp)
+        if glyph_name != expected_name:
+            errors.append(f"cmap maps U+{cp:04X} to {glyph_name}, expected {expected_name}")
+            continue
+        advance = h_metrics[glyph_name][0]
+        if advance != em_size:
+            errors.append(f"hmtx advance of {glyph_name} is {advance}, expected {em_size}")
+
+    # Only the ends of each range are checked, so that whole blocks stay cheap
+    for glyph in font.glyphs:
+        expected_name = glyph_name_for_char(glyph.char)
+        for first, last in glyph.ranges:
+            for cp in (first, last):
+                glyph_name = char_map.get(cp)
+                if glyph_name != expected_name:
+                    errors.append(f"cmap maps U+{cp:04X} to {glyph_name}, expected {expected_name}")
+
+    return errors
+
+
+def validate_font(path: str, font: Font, data: Optional[bytes] = None) -> ValidationResult:
+    try:
+        ttfont, mapped = _open_font(path, data)
+    except Exception as e:
+        return ValidationResult(path, [f"Could not open font: {e}"])
+    try:
+        errors = check_font(ttfont, font)
+    except Exception as e:
+        errors = [f"Could not read font: {e}"]
+    finally:
+        ttfont.close()
+        if mapped is not None:
+            mapped.close()
+    return ValidationResult(path, errors)
+
+
+def validate_collection(path: str, fonts: Dict[str, Font]) -> Iterator[ValidationResult]:
+    """Validates each font of a TrueType Collection against the spec with its family name."""
+    from fontTools.ttLib import TTCollection
+
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception as e:
+        yield ValidationResult(path, [f"Could not open collection: {e}"])
+        return
+    try:
+        collection = TTCollection(mapped, lazy=True)
+        for index, ttfont in enumerate(collection.fonts):
+            font_path = f"{path}#{index}"
+            try:
+                family_name = ttfont["name"].getDebugName(1)
+                if family_name not in fonts:
+                    yield ValidationResult(font_path, [f"Font {family_name} has no spec"])
+                    continue
+                yield ValidationResult(font_path, check_font(ttfont, fonts[family_name]))
+            except Exception as e:
+                yield ValidationResult(font_path, [f"Could not read font: {e}"])
+        collection.close()
+    finally:
+        mapped.close()
+
+
+def diff_fonts(path_a: str, path_b: str) -> List[str]:
+    """Compares two fonts table by table, returning a line for each table that differs."""
+    font_a, mapped_a = _open_font(path_a)
+    font_b, mapped_b = _open_font(path_b)
+    try:
+        tags_a = set(font_a.reader.keys())
+        tags_b = set(font_b.reader.keys())
+        lines = []
+        for tag in sorted(tags_a | tags_b):
+            if tag not in tags_b:
+                lines.append(f"{tag}: only in {path_a}")
+            elif tag not in tags_a:
+                lines.append(f"{tag}: only in {path_b}")
+            else:
+                data_a = font_a.reader[tag]
+                data_b = font_b.reader[tag]
+                if data_a != data_b:
+                    lines.append(f"{tag}: differs ({len(data_a):,} -> {len(data_b):,} bytes)")
+        return lines
+    finally:
+        font_a.close()
+        font_b.close()
+        mapped_a.close()
+        mapped_b.close()
+
+
+_bases: Dict[str, Font] = {}
+# The sweep archive being validated, opened once per process rather than per
+# entry, as opening it reads the whole central directory
+_archive: Optional[zipfile.ZipFile] = None
+
+
+def _init_worker(bases: Dict[str, Font], root: str):
+    global _archive
+    _bases.update(bases)
+    if root.endswith(".zip"):
+        _archive = zipfile.ZipFile(root)
+
+
+def _close_worker():
+    global _archive
+    if _archive is not None:
+        _archive.close()
+        _archive = None
+
+
+def _validate_entry(entry: dict, root: str) -> ValidationResult:
+    path = os.path.join(root, entry["file"])
+    if entry["base"] not in _bases:
+        return ValidationResult(path, [f"Base font {entry['base']} has no spec"])
+    try:
+        font = variant_from_params(_bases[entry["base"]], entry["name"], entry["params"])
+    except ValueError as e:
+        return ValidationResult(path, [f"Invalid variant: {e}"])
+    if _archive is not None:
+        return validate_font(path, font, _archive.read(entry["file"]))
+    return validate_font(path, font)
+
+
+def validate_sweep(root: str, bases: Dict[str, Font], jobs: Optional[int] = None) -> Iterator[ValidationResult]:
+    """Validates every font of a sweep directory or zip archive against its index entry."""
+    jobs = jobs or os.cpu_count() or 1
+    entries = list(read_index(root))
+    if jobs == 1:
+        _init_worker(bases, root)
+        try:
+            for entry in entries:
+                yield _validate_entry(entry, root)
+        finally:
+            _close_worker()
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(bases, root)) as executor:
+        chunk_size = max(1, len(entries) // (jobs * 8))
+        yield from executor.map(_validate_entry, entries, [root] * len(entries), chunksize=chunk_size)
+
+
+def main(argv=None):
+    from main import default_fonts
+
+    parser = argparse.ArgumentParser(description="Checks built fonts against their specs.")
+    parser.add_argument("path", nargs="?", default="dist",
+                        help="dist folder, a collection, or a sweep directory or zip archive (default: %(default)s)")
+    parser.add_argument("--diff", nargs=2, metavar=("A", "B"), help="compare two fonts table by table instead")
+    parser.add_argument("-j", "--jobs", type=job_count, default=None,
+                        help="number of validation processes to use (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    if args.diff:
+        lines = diff_fonts(*args.diff)
+        for line in lines:
+            print(line)
+        if not lines:
+            print("Fonts have identical tables")
+        sys.exit(1 if lines else 0)
+
+    fonts = default_fonts()
+    bases = {font.name: font for font in fonts}
+
+    start = time.perf_counter()
+    if args.path.endswith(".ttc"):
+        results = validate_collection(args.path, bases)
+    elif args.path.endswith(".zip") or os.path.exists(os.path.join(args.path, INDEX_NAME)):
+        results = validate_sweep(args.path, bases, jobs=args.jobs)
+    else:
+        results = (validate_font(os.path.join(args.path, f"{font.name}.ttf"), font) for font in fonts)
+
+    count = 0
+    failures = 0
+    for result in results:
+        count += 1
+        if result.errors:
+            failures += 1
+            for error in result.errors:
+                print(f"{result.path}: {error}")
+    elapsed = time.perf_counter() - start
+
+    print(f"Validated {count} fonts in {elapsed:.2f}s, {failures} with errors", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()